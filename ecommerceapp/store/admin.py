@@ -1,23 +1,23 @@
-import csv
 import json
-import requests
 from datetime import timedelta
 
 from django.utils import timezone
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
-from django.contrib import admin
-from django.db.models import Sum, F
-from django.db.models.functions import TruncDay
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.contrib import admin, messages
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
 from django.urls import path
 from django import forms
 from django.http import HttpResponseRedirect
 
+from .dashboard import get_kpis
+from .exports import invoice_payloads, order_rows, queue_export_job, stream_csv
+from .orders import InsufficientStock
+from .services import ServiceUnavailable, employee_service, invoice_service
 from .models import (
     Customer, Product, Order, OrderItem,
-    Payment, Shipment, Outbox, EmployeeLink, InvoiceLink
+    Payment, Shipment, Outbox, ExportJob, EmployeeLink, InvoiceLink
 )
 
 # ===================================================================
@@ -61,9 +61,8 @@ class MyAdminSite(admin.AdminSite):
     # --- Employee Microservice View ---
     def employee_stats_view(self, request):
         try:
-            response = requests.get("http://employee_service:3000/employee", timeout=2)
-            employee_data = response.json()
-        except Exception:
+            employee_data = employee_service.get_json("/employee")
+        except ServiceUnavailable:
             employee_data = {"error": "Node.js Service Offline"}
 
         context = {
@@ -76,54 +75,34 @@ class MyAdminSite(admin.AdminSite):
     # --- Invoice Microservice View ---
     def invoice_stats_view(self, request):
         try:
-            # Internal Docker request to the FastAPI service
-            response = requests.get("http://invoice_service:8001/api/v1/invoices/", timeout=2)
-            invoice_data = response.json()
-        except Exception:
-            invoice_data = []
+            # Internal Docker request to the FastAPI service (newest page of its invoice index)
+            invoice_data = invoice_service.get_json("/api/v1/invoices", params={"limit": 50})
+        except ServiceUnavailable:
+            invoice_data = {}
 
         context = {
             **self.each_context(request),
             'title': 'Invoice Management System',
-            'invoices': invoice_data,
+            'invoices': invoice_data.get('results', []),
+            'invoice_count': invoice_data.get('count'),
         }
         return render(request, 'admin/invoice_stats.html', context)
 
     # --- Dashboard Index (KPI Logic) ---
     def index(self, request, extra_context=None):
-        total_revenue = Order.objects.filter(complete=True).aggregate(Sum('total_due'))['total_due__sum'] or 0
-        customer_count = Customer.objects.count()
-
-        sales_data = (
-            Order.objects.filter(complete=True)
-            .annotate(day=TruncDay('date_order'))
-            .values('day')
-            .annotate(total=Sum('total_due'))
-            .order_by('day')[:7]
-        )
-        chart_data = [{"day": x['day'].strftime('%b %d'), "total": float(x['total'])} for x in sales_data]
-
-        # Employee Count from Microservice
-        employee_count = 0
-        try:
-            node_response = requests.get("http://employee_service:3000/employee", timeout=2)
-            if node_response.status_code == 200:
-                data = node_response.json()
-                employee_count = len(data) if isinstance(data, list) else data.get('count', 0)
-            else:
-                employee_count = "Error"
-        except Exception:
-            employee_count = "Offline"
+        # Served from a cached snapshot, see store/dashboard.py
+        kpis = get_kpis()
 
         extra_context = extra_context or {}
         extra_context.update({
-            'total_revenue': total_revenue,
-            'customer_count': customer_count,
-            'employee_count': employee_count,
-            'chart_data': json.dumps(chart_data),
-            'top_products': OrderItem.objects.values('product__name').annotate(total_sold=Sum('quantity')).order_by('-total_sold')[:5],
-            'low_stock_products': Product.objects.filter(stock_quantity__lt=5).order_by('stock_quantity'),
-            'recent_payments': Payment.objects.select_related('order', 'order__customer').order_by('-created_at')[:5],
+            'total_revenue': kpis['total_revenue'],
+            'customer_count': kpis['customer_count'],
+            'employee_count': kpis['employee_count'],
+            'chart_data': json.dumps(kpis['chart_data']),
+            'top_products': kpis['top_products'],
+            'low_stock_products': kpis['low_stock_products'],
+            'low_stock_count': kpis['low_stock_count'],
+            'recent_payments': kpis['recent_payments'],
         })
         return super().index(request, extra_context)
 
@@ -142,36 +121,53 @@ def get_order_total(request, order_id):
     except Order.DoesNotExist:
         return JsonResponse({'error': 'Order not found'}, status=404)
 
-@admin.action(description="Download PDF Invoice")
+@admin.action(description="Download PDF Invoice(s)")
 def download_invoice(modeladmin, request, queryset):
-    order = queryset.first() 
-    if not order: return HttpResponse("No order selected", status=400)
-    
-    payload = {
-        "order_id": str(order.id),
-        "customer_name": f"{order.customer.first_name} {order.customer.last_name}",
-        "amount": float(order.total_due),
-        "items": [{"name": i.product.name, "price": float(i.price_at_purchase)} for i in order.items.all()]
-    }
+    """One order downloads its PDF; several are rendered in one batch call and streamed back as a ZIP."""
+    payloads = list(invoice_payloads(queryset.order_by('id')))
+    if not payloads: return HttpResponse("No order selected", status=400)
+
+    if len(payloads) == 1:
+        path, filename, content_type = "/generate-invoice/", f"invoice_{payloads[0]['order_id']}.pdf", 'application/pdf'
+        body = payloads[0]
+    else:
+        path, filename, content_type = "/generate-invoices/", "invoices.zip", 'application/zip'
+        body = payloads
     try:
-        response = requests.post("http://invoice_service:8001/generate-invoice/", json=payload, timeout=5)
-        if response.status_code == 200:
-            django_response = HttpResponse(response.content, content_type='application/pdf')
-            django_response['Content-Disposition'] = f'attachment; filename="invoice_{order.id}.pdf"'
-            return django_response
-    except Exception:
+        # Long read timeout: a batch streams for as long as it takes to render
+        response = invoice_service.request("POST", path, json=body, stream=True, timeout=(0.5, 60))
+    except ServiceUnavailable:
         return HttpResponse("Invoice Service Unavailable", status=503)
+    if response.status_code != 200:
+        response.close()
+        return HttpResponse(f"Invoice Service returned {response.status_code}", status=502)
+
+    django_response = StreamingHttpResponse(response.iter_content(64 * 1024), content_type=content_type)
+    django_response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return django_response
+
+@admin.action(description="Recalculate order totals")
+def recalculate_totals(modeladmin, request, queryset):
+    updated = Order.objects.recalculate_totals(queryset.values_list("pk", flat=True))
+    modeladmin.message_user(request, f"Recalculated totals for {updated} order(s).")
 
 @admin.action(description="Export selected orders to CSV")
 def export_orders_to_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(stream_csv(order_rows(queryset)), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="orders_report.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Order ID', 'Customer', 'Date', 'Status', 'Total Due'])
-    for order in queryset:
-        writer.writerow([order.id, str(order.customer), order.date_order.strftime("%Y-%m-%d %H:%M"), "Complete" if order.complete else "Pending", order.total_due])
     return response
 
+@admin.action(description="Export selected orders with line items to CSV")
+def export_order_items_to_csv(modeladmin, request, queryset):
+    response = StreamingHttpResponse(stream_csv(order_rows(queryset, with_items=True)), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="order_items_report.csv"'
+    return response
+
+@admin.action(description="Export selected orders with line items to a file (background)")
+def export_orders_to_file(modeladmin, request, queryset):
+    job = queue_export_job(queryset, with_items=True)
+    modeladmin.message_user(request, f"Export #{job.pk} queued, it will be written to {job.path}")
+
 
 # ===================================================================
 # 4. DATA MODEL ADMINS & INLINES
@@ -185,22 +181,56 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order, site=mysite)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'customer', 'date_order', 'complete', 'total_due']
+    list_display = ['id', 'customer', 'date_order', 'complete', 'total_due', 'expired_at']
     inlines = [OrderItemInline]
-    actions = [export_orders_to_csv, download_invoice]
-    readonly_fields = ['total_due']
+    actions = [export_orders_to_csv, export_order_items_to_csv, export_orders_to_file, download_invoice, recalculate_totals]
+    readonly_fields = ['total_due', 'expired_at']
     class Media:
         js = ('js/admin_order_calc.js',)
 
+class ProductChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sharded stock is only a reconciled total here (see store/inventory.py)
+        if self.instance.stock_shards:
+            self.fields['stock_quantity'].disabled = True
+
 @admin.register(Product, site=mysite)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'current_price', 'stock_quantity']
+    list_display = ['name', 'current_price', 'stock_quantity', 'stock_shards']
     list_editable = ['current_price', 'stock_quantity']
 
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', ProductChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Sharding is changed with inventory.shard_stock, which moves the stock too
+        if obj is not None and obj.stock_shards:
+            return ['stock_shards', 'stock_quantity']
+        return ['stock_shards']
+
 @admin.register(Payment, site=mysite)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['id', 'order', 'amount', 'method', 'status', 'created_at']
 
+    def changeform_view(self, request, *args, **kwargs):
+        # Marking an expired order paid retakes its stock; the save is rolled back if it is gone
+        try:
+            return super().changeform_view(request, *args, **kwargs)
+        except InsufficientStock as exc:
+            self.message_user(request, f"Payment not saved, the order expired and its stock was sold: {exc}", messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+@admin.register(ExportJob, site=mysite)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'with_items', 'row_count', 'path', 'created_at', 'finished_at']
+    list_filter = ['status']
+    exclude = ['order_ids']
+    readonly_fields = ['status', 'with_items', 'path', 'row_count', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def has_add_permission(self, request): return False
+
 
 # ===================================================================
 # 5. FINAL REGISTRATIONS
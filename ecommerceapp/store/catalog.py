@@ -0,0 +1,171 @@
+# store/catalog.py
+"""
+Read-through cache for the product catalog API.
+
+``ProductViewSet`` list/detail responses are cached per URL (host, path and
+sorted query string). Each entry records the version of every product it
+holds; a hit whose products have been bumped since is treated as a miss.
+Committed writes bump only the products they touched (see
+``schedule_catalog_invalidation`` in models.py), so a checkout invalidates
+the detail entry and the list pages of the products it sold and nothing else.
+
+List pages also live under a listing version, bumped when a product is
+created, edited or deleted (pages may gain, lose or reorder rows). Pages
+filtered or ordered by stock_quantity can change with any stock movement, so
+they are keyed by the epoch bumped on every invalidation as well.
+
+A miss is recomputed by a single request per key; concurrent requests for the
+same key wait briefly for its result instead of all querying the database.
+Hit/miss counters are kept in the cache and read with ``stats()``.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = "catalog:version"  # list pages
+EPOCH_KEY = "catalog:epoch"  # bumped by every invalidation
+PRODUCT_VERSION_KEY = "catalog:product:{}"
+STATS_KEYS = {name: f"catalog:stats:{name}" for name in ("hits", "misses", "coalesced")}
+
+# How long a recompute may hold a key, and how long others wait for it
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 2.0
+POLL_INTERVAL = 0.05
+
+
+def _ttl():
+    return getattr(settings, "CATALOG_CACHE_TTL", 300)  # seconds
+
+
+def _count(name):
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def stats():
+    """Returns ``{"hits": n, "misses": n, "coalesced": n}`` since the counters were last reset."""
+    values = cache.get_many(STATS_KEYS.values())
+    return {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+def current_version(key=VERSION_KEY):
+    # A fresh version is time-based so it never collides with pages cached
+    # under a version the cache has since evicted.
+    return cache.get_or_set(key, time.time_ns, timeout=None)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(product_ids=(), listing=False):
+    """
+    Makes cached responses holding any of ``product_ids`` stale, and every
+    list page too if ``listing``.
+    """
+    for pk in product_ids:
+        _bump(PRODUCT_VERSION_KEY.format(pk))
+    if listing:
+        _bump(VERSION_KEY)
+    _bump(EPOCH_KEY)
+
+
+def product_versions(product_ids):
+    keys = {pk: PRODUCT_VERSION_KEY.format(pk) for pk in product_ids}
+    values = cache.get_many(keys.values())
+    return {pk: values.get(key) for pk, key in keys.items()}
+
+
+def _product_ids(data):
+    """Ids of the products in a list or detail payload; None if a row has no id (``?fields=``)."""
+    rows = data.get("results", [data]) if isinstance(data, dict) else data
+    ids = [row.get("id") for row in rows]
+    return None if None in ids else ids
+
+
+def response_key(request, detail=False):
+    query = sorted(request.query_params.lists())
+    raw = f"{request.get_host()}{request.path}?{query}"
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    if detail:
+        return f"catalog:detail:{digest}"
+    scope = current_version()
+    if "stock_quantity" in str(query):
+        scope = f"{scope}:{current_version(EPOCH_KEY)}"
+    return f"catalog:list:{scope}:{digest}"
+
+
+def _fresh(entry):
+    """The cached data of ``entry`` if none of its products changed since, else None."""
+    if entry is None:
+        return None
+    data, versions = entry
+    return data if product_versions(versions) == versions else None
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        data = _fresh(cache.get(key))
+        if data is not None:
+            return data
+    return None
+
+
+def cached_response(request, render, product_id=None):
+    """
+    Returns the cached response for ``request``, calling ``render()`` (which
+    returns a DRF Response) on a miss. Only 200 responses are stored. Pass
+    ``product_id`` for a detail response.
+    """
+    key = response_key(request, detail=product_id is not None)
+    entry = cache.get(key)
+    data = _fresh(entry)
+    if data is not None:
+        _count("hits")
+        return Response(data, headers={"X-Cache": "HIT"})
+
+    _count("misses")
+    # add() returns None rather than False when the cache is unreachable;
+    # in that case just render, there is nothing to coordinate through.
+    acquired = cache.add(f"{key}:lock", True, timeout=LOCK_TIMEOUT)
+    if acquired is False:
+        data = _wait_for(key)
+        if data is not None:
+            _count("coalesced")
+            return Response(data, headers={"X-Cache": "HIT"})
+
+    # Versions read before rendering are safe to record: a write committed
+    # after the render's queries bumps its products past them. They are known
+    # for a detail response and for a page whose rows have not changed.
+    known = [product_id] if product_id is not None else (list(entry[1]) if entry is not None else None)
+    before = product_versions(known) if known is not None else None
+    epoch = current_version(EPOCH_KEY)
+    try:
+        response = render()
+        ids = _product_ids(response.data) if response.status_code == status.HTTP_200_OK else None
+        if ids is not None:
+            versions = None
+            if before is not None and set(ids) == set(before):
+                versions = before
+            elif current_version(EPOCH_KEY) == epoch:
+                # Nothing was invalidated while rendering, so nothing is missing from the data
+                versions = product_versions(ids)
+            if versions is not None:
+                cache.set(key, (response.data, versions), timeout=_ttl())
+    finally:
+        if acquired:
+            cache.delete(f"{key}:lock")
+    response["X-Cache"] = "MISS"
+    return response
@@ -0,0 +1,114 @@
+# store/dashboard.py
+"""
+Admin dashboard KPIs.
+
+The figures shown on ``MyAdminSite.index`` are computed into a plain snapshot
+and served from the cache. A snapshot older than DASHBOARD_MAX_STALENESS is
+recomputed by a single request (the others keep serving the previous one),
+and ``manage.py refresh_dashboard`` can keep it warm on a schedule so page
+loads never pay for the aggregations.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from store.models import Customer, DailyProductSales, DailySales, Payment, Product
+from store.services import ServiceUnavailable, employee_service, submit
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "dashboard:kpis"
+LOCK_KEY = "dashboard:kpis:refreshing"
+LOW_STOCK_THRESHOLD = 5
+
+
+def _max_staleness():
+    return getattr(settings, "DASHBOARD_MAX_STALENESS", 60)  # seconds
+
+
+def _employee_count():
+    try:
+        data = employee_service.get_json("/employee")
+    except ServiceUnavailable:
+        return "Offline"
+    return len(data) if isinstance(data, list) else data.get('count', 0)
+
+
+def compute_kpis():
+    """Runs every dashboard query once and returns the results as plain data."""
+    # The employee service is called while the database queries run
+    employee_count = submit(_employee_count)
+
+    # Sales figures come from the daily rollup (see store/rollups.py)
+    total_revenue = DailySales.objects.totals()['revenue']
+
+    today = timezone.localdate()
+    first_day = today - timedelta(days=6)
+    revenue_by_day = {row.date: row.revenue for row in DailySales.objects.window(first_day, today)}
+    chart_data = [
+        {"day": day.strftime('%b %d'), "total": float(revenue_by_day.get(day, 0))}
+        for day in (first_day + timedelta(days=n) for n in range(7))
+    ]
+
+    top_products = list(DailyProductSales.objects.top_products(limit=5))
+    low_stock_products = list(
+        Product.objects.filter(stock_quantity__lt=LOW_STOCK_THRESHOLD)
+        .order_by('stock_quantity')
+        .values('pk', 'name', 'stock_quantity')
+    )
+    recent_payments = [
+        {
+            "order": {
+                "id": p.order_id,
+                "customer": {
+                    "first_name": p.order.customer.first_name,
+                    "last_name": p.order.customer.last_name,
+                },
+            },
+            "amount": p.amount,
+            "method": p.method,
+            "status": p.status,
+            "created_at": p.created_at,
+        }
+        for p in Payment.objects.select_related('order__customer').order_by('-created_at')[:5]
+    ]
+
+    return {
+        'computed_at': timezone.now(),
+        'total_revenue': total_revenue,
+        'customer_count': Customer.objects.count(),
+        'employee_count': employee_count.result(),
+        'chart_data': chart_data,
+        'top_products': top_products,
+        'low_stock_products': low_stock_products,
+        'low_stock_count': len(low_stock_products),
+        'recent_payments': recent_payments,
+    }
+
+
+def refresh_kpis():
+    """Recomputes the snapshot and stores it in the cache."""
+    kpis = compute_kpis()
+    # Kept well past the staleness bound so a slow refresh can fall back to it
+    cache.set(CACHE_KEY, kpis, timeout=_max_staleness() * 10)
+    return kpis
+
+
+def get_kpis():
+    """Returns a snapshot at most DASHBOARD_MAX_STALENESS seconds old."""
+    kpis = cache.get(CACHE_KEY)
+    if kpis is None:
+        return refresh_kpis()
+
+    age = (timezone.now() - kpis['computed_at']).total_seconds()
+    if age > _max_staleness() and cache.add(LOCK_KEY, True, timeout=30):
+        try:
+            kpis = refresh_kpis()
+        except Exception as e:
+            logger.error(f"Dashboard refresh failed, serving stale KPIs: {e}")
+        finally:
+            cache.delete(LOCK_KEY)
+    return kpis
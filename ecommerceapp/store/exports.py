@@ -0,0 +1,182 @@
+# store/exports.py
+"""
+Order CSV exports.
+
+Rows are produced from a server-side cursor (``.iterator(chunk_size=...)``)
+with the customer joined in, so memory stays flat however many orders are
+exported. ``stream_csv`` feeds a StreamingHttpResponse; ``write_csv`` writes
+very large ranges to a file instead.
+
+Exports requested from the admin are queued as ExportJob rows and written by
+``manage.py run_export_jobs``, not by the web worker: a recycled or timed-out
+worker would kill the export silently. A job whose worker died while running
+is picked up again once EXPORT_JOB_TIMEOUT has passed.
+
+``invoice_payloads`` feeds the invoice service's batch endpoint.
+"""
+import csv
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from store.models import ExportJob, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+ORDER_HEADER = ['Order ID', 'Customer', 'Date', 'Status', 'Total Due']
+ITEM_HEADER = ['Product', 'Quantity', 'Unit Price', 'Line Total']
+
+# Rows joined into one chunk before it is handed to the response/file
+ROWS_PER_WRITE = 500
+
+
+class Echo:
+    """File-like object whose write() just returns the value (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def order_rows(queryset, with_items=False, chunk_size=2000):
+    """Yields the header and one row per order (or per line item with ``with_items``)."""
+    yield ORDER_HEADER + ITEM_HEADER if with_items else ORDER_HEADER
+
+    queryset = queryset.select_related('customer')
+    if with_items:
+        queryset = queryset.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
+
+    for order in queryset.iterator(chunk_size=chunk_size):
+        row = [
+            order.id,
+            str(order.customer),
+            order.date_order.strftime("%Y-%m-%d %H:%M"),
+            "Complete" if order.complete else "Pending",
+            order.total_due,
+        ]
+        if not with_items:
+            yield row
+            continue
+        items = order.items.all()
+        if not items:
+            yield row + ['', '', '', '']
+        for item in items:
+            yield row + [item.product.name, item.quantity, item.price_at_purchase, item.get_total()]
+
+
+def stream_csv(rows):
+    """Encodes ``rows`` as CSV text chunks of ROWS_PER_WRITE rows."""
+    writer = csv.writer(Echo())
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def write_csv(rows, path):
+    """Writes ``rows`` to ``path`` atomically (via a temporary file). Returns the row count."""
+    tmp_path = f"{path}.part"
+    count = -1  # header
+    try:
+        with open(tmp_path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    except BaseException:
+        # No half-written file is left in the exports directory
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+
+def export_path(with_items=False):
+    directory = os.path.join(settings.MEDIA_ROOT, 'exports')
+    os.makedirs(directory, exist_ok=True)
+    kind = 'order_items' if with_items else 'orders'
+    return os.path.join(directory, f"{kind}_{timezone.now():%Y%m%d_%H%M%S_%f}.csv")
+
+
+def job_timeout():
+    return getattr(settings, "EXPORT_JOB_TIMEOUT", 3600)  # seconds
+
+
+def queue_export_job(queryset, with_items=False):
+    """Queues an export of the orders in ``queryset``; returns the ExportJob."""
+    return ExportJob.objects.create(
+        order_ids=list(queryset.order_by("pk").values_list("pk", flat=True)),
+        with_items=with_items,
+        path=export_path(with_items),
+    )
+
+
+def job_rows(job, chunk_size=2000):
+    """order_rows for the job's orders, fetched ``chunk_size`` ids at a time."""
+    ids = job.order_ids
+    yield ORDER_HEADER + ITEM_HEADER if job.with_items else ORDER_HEADER
+    for start in range(0, len(ids), chunk_size):
+        orders = Order.objects.filter(pk__in=ids[start:start + chunk_size]).order_by("pk")
+        rows = order_rows(orders, job.with_items, chunk_size)
+        next(rows)  # header
+        yield from rows
+
+
+def claim_export_job(now=None):
+    """
+    Marks the oldest pending job running and returns it, or None. A job still
+    running after EXPORT_JOB_TIMEOUT lost its worker and is claimed again.
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=job_timeout())
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status="pending") | Q(status="running", started_at__lt=stale))
+            .order_by("pk")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.started_at = now
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def run_export_job(job, chunk_size=2000):
+    """Writes ``job``'s file and records the outcome on it. Returns True on success."""
+    try:
+        count = write_csv(job_rows(job, chunk_size), job.path)
+    except Exception as e:
+        logger.error(f"Export job {job.pk} for {job.path} failed: {e}")
+        ExportJob.objects.filter(pk=job.pk).update(status="failed", error=str(e), finished_at=timezone.now())
+        return False
+    logger.info(f"Export job {job.pk} wrote {count} row(s) to {job.path}")
+    ExportJob.objects.filter(pk=job.pk).update(status="done", row_count=count, finished_at=timezone.now())
+    return True
+
+
+def invoice_payloads(queryset, chunk_size=2000):
+    """Yields the invoice service's InvoiceData for each order in ``queryset``."""
+    queryset = queryset.select_related('customer').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+    for order in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            "order_id": str(order.id),
+            "customer_name": f"{order.customer.first_name} {order.customer.last_name}",
+            "amount": float(order.total_due),
+            "items": [{"name": i.product.name, "price": float(i.price_at_purchase), "quantity": i.quantity} for i in order.items.all()],
+        }
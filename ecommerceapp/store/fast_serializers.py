@@ -0,0 +1,65 @@
+# store/fast_serializers.py
+"""
+Read-only serialization for OrderViewSet list/retrieve.
+
+Produces exactly the JSON of OrderSerializer (url, id, customer, items,
+total_due, transaction_id, complete) from ``.values()`` rows with plain dict
+building: one query for the orders, one for all of their items, and the
+detail URL formatted from a single ``reverse()``.
+"""
+from collections import defaultdict
+
+from rest_framework.reverse import reverse
+
+from store.models import OrderItem
+
+ORDER_FIELDS = ["url", "id", "customer", "items", "total_due", "transaction_id", "complete"]
+# Columns fetched per order; date_order is needed for cursor positions
+ORDER_COLUMNS = ["id", "customer_id", "total_due", "transaction_id", "complete", "date_order"]
+
+
+def _decimal(value):
+    # Matches DRF's DecimalField(coerce_to_string=True) for 2-place columns
+    return None if value is None else f"{value:.2f}"
+
+
+def _items_by_order(order_ids):
+    items = defaultdict(list)
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("id")
+        .values_list("order_id", "product_id", "product__name", "quantity", "price_at_purchase")
+    )
+    for order_id, product_id, product_name, quantity, price in rows:
+        items[order_id].append({
+            "product_id": product_id,
+            "product": product_name,
+            "quantity": quantity,
+            "price_at_purchase": _decimal(price),
+        })
+    return items
+
+
+def serialize_orders(rows, request, fields=None):
+    """
+    Serializes ``rows`` (dicts with ORDER_COLUMNS) like OrderSerializer would.
+    ``fields`` restricts the output as ``?fields=`` does.
+    """
+    wanted = [name for name in ORDER_FIELDS if fields is None or name in fields]
+    items = _items_by_order([row["id"] for row in rows]) if "items" in wanted else {}
+    detail_url = reverse("order-list", request=request) + "{}/"
+
+    data = []
+    for row in rows:
+        order_id = row["id"]
+        values = {
+            "url": detail_url.format(order_id),
+            "id": order_id,
+            "customer": row["customer_id"],
+            "items": items.get(order_id, []),
+            "total_due": _decimal(row["total_due"]),
+            "transaction_id": row["transaction_id"],
+            "complete": row["complete"],
+        }
+        data.append({name: values[name] for name in wanted})
+    return data
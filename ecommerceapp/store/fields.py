@@ -0,0 +1,79 @@
+# store/fields.py
+"""
+Batched primary-key resolution for writable related fields.
+
+DRF's PrimaryKeyRelatedField runs one ``SELECT ... WHERE pk = %s`` per value,
+so a 200-line cart costs 200 queries before validation even finishes. The
+first BatchedPrimaryKeyRelatedField to validate walks the whole payload of
+its root serializer, gathers every pk aimed at each batched field (a nested
+``many=True`` serializer shares one field instance across its items), and
+loads them with one ``pk__in`` query per field; the rest are dictionary
+lookups. Values the batch cannot answer fall back to the normal per-value
+lookup, so error messages are unchanged.
+"""
+from django.core.exceptions import ValidationError
+from rest_framework import serializers
+
+
+def _normalize(model, value):
+    """``value`` as the model's pk type, or None if it is not a usable pk."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    try:
+        return model._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+
+
+def _collect(serializer, data, found):
+    """Adds ``{batched field: set(pks)}`` for ``data`` as validated by ``serializer``."""
+    if isinstance(serializer, serializers.ListSerializer):
+        if isinstance(data, list):
+            for item in data:
+                _collect(serializer.child, item, found)
+        return
+    if not isinstance(data, dict):
+        return
+
+    for field in serializer.fields.values():
+        if field.read_only or field.field_name not in data:
+            continue
+        value = data[field.field_name]
+        if isinstance(field, serializers.ManyRelatedField):
+            field, values = field.child_relation, value if isinstance(value, list) else []
+        else:
+            values = [value]
+
+        if isinstance(field, BatchedPrimaryKeyRelatedField):
+            model = field.get_queryset().model
+            pks = found.setdefault(field, set())
+            pks.update(pk for pk in (_normalize(model, v) for v in values) if pk is not None)
+        elif isinstance(field, serializers.BaseSerializer):
+            _collect(field, value, found)
+
+
+class BatchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """A PrimaryKeyRelatedField that resolves every pk in the payload with one query."""
+
+    def _batch(self):
+        """``(pks looked up, {pk: object})`` for this field, loading the whole payload once."""
+        cache = self.root.__dict__.setdefault("_batched_related", {})
+        if self not in cache:
+            found = {}
+            _collect(self.root, getattr(self.root, "initial_data", None), found)
+            for field, pks in found.items():
+                objects = {obj.pk: obj for obj in field.get_queryset().filter(pk__in=pks)} if pks else {}
+                cache[field] = (pks, objects)
+            cache.setdefault(self, (set(), {}))
+        return cache[self]
+
+    def to_internal_value(self, data):
+        if self.pk_field is None:
+            pks, objects = self._batch()
+            pk = _normalize(self.get_queryset().model, data)
+            if pk in pks:
+                obj = objects.get(pk)
+                if obj is None:
+                    self.fail("does_not_exist", pk_value=data)
+                return obj
+        return super().to_internal_value(data)
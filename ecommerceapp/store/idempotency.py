@@ -0,0 +1,174 @@
+# store/idempotency.py
+"""
+Storage for IdempotencyMiddleware.
+
+Each Idempotency-Key maps to one cache entry, an ``Entry`` tuple:
+
+* in flight: ``(fingerprint, None, (), None)``, claimed with ``cache.add``
+  and expiring after IDEMPOTENCY_LOCK_TTL;
+* done: ``(fingerprint, status, headers, zlib(body))``, written over the
+  claim with a single ``cache.set`` and kept for IDEMPOTENCY_RESPONSE_TTL.
+
+Bodies larger than IDEMPOTENCY_MAX_BODY_BYTES (after compression) and
+streaming responses are stored without a body; a repeat is then refused
+rather than replayed. ``fingerprint`` is a hash of the method, path and raw
+body, so a key reused for a different request is detected. Views marked
+``@streams_body`` read ``request.stream`` themselves (bulk uploads), so their
+body is left out of the fingerprint and never loaded into memory here.
+
+When the cache is unreachable (django-redis with IGNORE_EXCEPTIONS answers
+``add`` with None), entries go to the IdempotencyRecord table instead. The
+table is only consulted then, so a healthy cache costs no query.
+"""
+import hashlib
+import zlib
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from store.models import IdempotencyRecord
+
+Entry = namedtuple("Entry", ["fingerprint", "status", "headers", "body"])
+
+# Never replayed: cookies belong to the original client session
+SKIPPED_HEADERS = {"set-cookie", "content-length"}
+
+
+def lock_ttl():
+    return getattr(settings, "IDEMPOTENCY_LOCK_TTL", 60)  # seconds
+
+
+def response_ttl():
+    return getattr(settings, "IDEMPOTENCY_RESPONSE_TTL", 86400)  # seconds
+
+
+def max_body_bytes():
+    return getattr(settings, "IDEMPOTENCY_MAX_BODY_BYTES", 64 * 1024)
+
+
+def streams_body(view):
+    """Marks a view (or viewset action) that reads ``request.stream`` itself."""
+    view.streams_body = True
+    return view
+
+
+def _streams_body(request):
+    try:
+        match = resolve(request.path_info, getattr(request, "urlconf", None))
+    except Resolver404:
+        return False
+    view = match.func
+    # Router views map each method to an action of the viewset
+    action = getattr(view, "actions", {}).get(request.method.lower())
+    if action is not None:
+        view = getattr(view.cls, action, view)
+    return getattr(view, "streams_body", False)
+
+
+def fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.get_full_path()}\n".encode())
+    if _streams_body(request):
+        # request.body would load the whole upload (or raise RequestDataTooBig)
+        digest.update(f"{request.content_type} {request.headers.get('Content-Length', '')}".encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def pending(fingerprint):
+    return Entry(fingerprint, None, (), None)
+
+
+def entry_for(fingerprint, response):
+    """The Entry recorded for ``response``; the body is dropped if streaming or too large."""
+    headers = tuple((name, value) for name, value in response.items() if name.lower() not in SKIPPED_HEADERS)
+    body = None
+    if not response.streaming:
+        body = zlib.compress(response.content)
+        if len(body) > max_body_bytes():
+            body = None
+    return Entry(fingerprint, response.status_code, headers, body)
+
+
+class CacheStore:
+    def _key(self, key):
+        return f"idemp:{key}"
+
+    def claim(self, key, fingerprint):
+        """True if claimed, False if the key exists, None if the cache is down."""
+        return cache.add(self._key(key), pending(fingerprint), timeout=lock_ttl())
+
+    def get(self, key):
+        entry = cache.get(self._key(key))
+        return Entry(*entry) if entry is not None else None
+
+    def save(self, key, entry):
+        cache.set(self._key(key), tuple(entry), timeout=response_ttl())
+
+    def release(self, key):
+        cache.delete(self._key(key))
+
+
+class DatabaseStore:
+    def claim(self, key, fingerprint):
+        now = timezone.now()
+        IdempotencyRecord.objects.filter(key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.create(
+                    key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=lock_ttl())
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def get(self, key):
+        record = IdempotencyRecord.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+        if record is None:
+            return None
+        body = bytes(record.body) if record.body is not None else None
+        return Entry(record.fingerprint, record.status_code, tuple(map(tuple, record.headers)), body)
+
+    def save(self, key, entry):
+        IdempotencyRecord.objects.filter(key=key).update(
+            status_code=entry.status,
+            headers=list(entry.headers),
+            body=entry.body,
+            expires_at=timezone.now() + timedelta(seconds=response_ttl()),
+        )
+
+    def release(self, key):
+        IdempotencyRecord.objects.filter(key=key).delete()
+
+
+cache_store = CacheStore()
+database_store = DatabaseStore()
+
+
+def claim(key, fingerprint):
+    """
+    Claims ``key`` for a new request. Returns ``(store, entry)``: ``entry`` is
+    None when the caller owns the key and must ``save`` or ``release`` it on
+    ``store``, otherwise it is the existing Entry.
+    """
+    claimed = cache_store.claim(key, fingerprint)
+    if claimed:
+        return cache_store, None
+    if claimed is False:
+        # An entry that expired in between is treated as still in flight
+        return cache_store, cache_store.get(key) or pending(fingerprint)
+
+    if database_store.claim(key, fingerprint):
+        return database_store, None
+    return database_store, database_store.get(key) or pending(fingerprint)
+
+
+def purge_expired():
+    """Deletes expired database entries; returns how many."""
+    return IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()[0]
@@ -0,0 +1,113 @@
+# store/imports.py
+"""
+Bulk order import (``POST /api/v1/orders/import/``).
+
+The body is JSON lines, one order per line in the shape OrderSerializer
+accepts. Records are handled in chunks of ``chunk_size``: each chunk is
+validated together (related pks resolved with one query per field, see
+store/fields.py) and placed with ``place_orders``, so a chunk costs a fixed
+number of queries whatever its size. One result is returned per line.
+
+``on_error="skip"`` (the default) commits every valid record, each chunk in
+its own transaction. ``on_error="abort"`` runs the whole import in a single
+transaction and rolls all of it back if any record fails.
+"""
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from store.orders import place_orders
+
+ON_ERROR_CHOICES = ("skip", "abort")
+
+
+def default_chunk_size():
+    return getattr(settings, "ORDER_IMPORT_CHUNK_SIZE", 500)
+
+
+def max_chunk_size():
+    return getattr(settings, "ORDER_IMPORT_MAX_CHUNK_SIZE", 5000)
+
+
+def parse_lines(stream):
+    """Yields ``(line_number, record, error)`` for each non-blank line of ``stream``."""
+    for number, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield number, None, {"non_field_errors": [f"Invalid JSON: {e}"]}
+            continue
+        if not isinstance(record, dict):
+            yield number, None, {"non_field_errors": ["Each line must be a JSON object."]}
+            continue
+        yield number, record, None
+
+
+def _import_chunk(chunk, serializer_class, context):
+    """Validates and places one chunk; returns its results in line order."""
+    results = {}
+    valid = []
+
+    records = [record for _, record, error in chunk if error is None]
+    # The list serializer is only the root that batched fields walk; each
+    # record is validated on its own so one bad record fails alone.
+    child = serializer_class(data=records, many=True, context=context).child
+    for number, record, error in chunk:
+        if error is None:
+            try:
+                valid.append((number, child.run_validation(record)))
+                continue
+            except serializers.ValidationError as e:
+                error = e.detail
+        results[number] = {"line": number, "status": "error", "errors": error}
+
+    carts = []
+    for _, data in valid:
+        items = data.pop("items")
+        carts.append(([(item["product"].pk, item["quantity"]) for item in items], data))
+
+    for (number, _), outcome in zip(valid, place_orders(carts) if carts else []):
+        if isinstance(outcome, list):
+            results[number] = {"line": number, "status": "error", "errors": {"items": outcome}}
+        else:
+            results[number] = {"line": number, "status": "created", "id": outcome.pk}
+
+    return [results[number] for number, _, _ in chunk]
+
+
+def import_orders(stream, serializer_class, context=None, chunk_size=None, on_error="skip"):
+    """
+    Imports the JSON-lines ``stream``. Returns ``(results, committed)`` where
+    ``results`` has one dict per record (``line``, ``status`` and ``id`` or
+    ``errors``) and ``committed`` is False when ``on_error="abort"`` rolled
+    the import back.
+    """
+    chunk_size = max(1, min(chunk_size or default_chunk_size(), max_chunk_size()))
+    lines = parse_lines(stream)
+    results = []
+
+    def run():
+        # place_orders commits each chunk on its own unless wrapped below
+        while chunk := list(islice(lines, chunk_size)):
+            results.extend(_import_chunk(chunk, serializer_class, context))
+
+    if on_error != "abort":
+        run()
+        return results, True
+
+    with transaction.atomic():
+        run()
+        if all(result["status"] == "created" for result in results):
+            return results, True
+        transaction.set_rollback(True)
+
+    for result in results:
+        if result["status"] == "created":
+            result["status"] = "rolled_back"
+            del result["id"]
+    return results, False
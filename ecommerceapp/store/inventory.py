@@ -0,0 +1,215 @@
+# store/inventory.py
+"""
+Sharded stock for hot products, and stock reservations.
+
+A product with ``stock_shards = N`` keeps its stock in N StockShard rows. A
+checkout takes its units from any one shard that has enough and is not locked
+by another checkout (``FOR UPDATE SKIP LOCKED``), so up to N buyers of the
+same product proceed in parallel instead of queueing on the Product row. Only
+when no single shard can serve the request are all of the product's shards
+locked (in shard order) and drained together.
+
+Every line of an order is recorded as a StockReservation that expires after
+STOCK_RESERVATION_TTL seconds unless the order is paid; ``release_expired``
+puts the stock of expired reservations back and marks their order expired
+(``Order.expired_at``). A payment that arrives for an expired order takes the
+stock again or fails (``orders.reinstate_order``). ``reconcile_totals``
+refreshes Product.stock_quantity of sharded products from their shards for
+display.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from store.models import Order, Product, StockReservation, StockShard, schedule_catalog_invalidation
+
+logger = logging.getLogger(__name__)
+
+
+def reservation_ttl():
+    return getattr(settings, "STOCK_RESERVATION_TTL", 1800)  # seconds
+
+
+def available(product_id):
+    """Units left across the product's shards."""
+    return StockShard.objects.filter(product_id=product_id).aggregate(total=Sum("quantity"))["total"] or 0
+
+
+def take_from_shards(product_id, quantity):
+    """
+    Removes ``quantity`` units from the product's shards inside the current
+    transaction. Returns ``[(shard, units), ...]`` or None (nothing taken) if
+    the shards do not hold enough.
+    """
+    shard = (
+        StockShard.objects.select_for_update(skip_locked=True)
+        .filter(product_id=product_id, quantity__gte=quantity)
+        .order_by("?")
+        .first()
+    )
+    if shard is not None:
+        StockShard.objects.filter(pk=shard.pk).update(quantity=F("quantity") - quantity)
+        return [(shard.shard, quantity)]
+
+    # No single free shard can serve it: lock them all and drain in order
+    shards = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by("shard"))
+    if sum(s.quantity for s in shards) < quantity:
+        return None
+
+    taken = []
+    remaining = quantity
+    for s in shards:
+        units = min(s.quantity, remaining)
+        if units:
+            s.quantity -= units
+            taken.append((s.shard, units))
+            remaining -= units
+        if not remaining:
+            break
+    StockShard.objects.bulk_update(shards, ["quantity"])
+    return taken
+
+
+def shard_stock(product_id, shards):
+    """
+    Spreads a product's stock over ``shards`` StockShard rows (0 folds it
+    back into Product.stock_quantity). Units held by open reservations are
+    not affected.
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product_id)
+        total = available(product_id) if product.stock_shards else product.stock_quantity
+        StockShard.objects.filter(product_id=product_id).delete()
+
+        if shards:
+            StockShard.objects.bulk_create([
+                StockShard(product_id=product_id, shard=n, quantity=total // shards + (n < total % shards))
+                for n in range(shards)
+            ])
+        product.stock_shards = shards
+        product.stock_quantity = total
+        product.save(update_fields=["stock_shards", "stock_quantity"])
+
+
+def restock(product_id, quantity):
+    """Adds ``quantity`` units to a product, spread evenly over its shards if it has them."""
+    with transaction.atomic():
+        product = Product.objects.get(pk=product_id)
+        if product.stock_shards:
+            n = product.stock_shards
+            StockShard.objects.filter(product_id=product_id).update(
+                quantity=F("quantity") + Case(
+                    *(When(shard=s, then=Value(quantity // n + (s < quantity % n))) for s in range(n)),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+        Product.objects.filter(pk=product_id).update(stock_quantity=F("stock_quantity") + quantity)
+        schedule_catalog_invalidation([product_id])
+
+
+def reserve(order, takes):
+    """
+    Records ``takes`` — ``[(product_id, shard_or_None, units), ...]`` — as
+    reservations of ``order`` that expire after STOCK_RESERVATION_TTL.
+    """
+    reserve_many([(order, takes)])
+
+
+def reserve_many(orders_takes):
+    """``reserve`` for ``[(order, takes), ...]`` in a single INSERT."""
+    expires_at = timezone.now() + timedelta(seconds=reservation_ttl())
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, shard=shard, quantity=units, expires_at=expires_at)
+        for order, takes in orders_takes
+        for product_id, shard, units in takes
+    ])
+
+
+def _return_stock(reservations):
+    """
+    Adds reserved units back to their shard (or Product row) in a fixed lock
+    order. Returns the ids of the products whose stock_quantity changed.
+    """
+    sharded = dict(
+        Product.objects.filter(pk__in={r.product_id for r in reservations}, stock_shards__gt=0)
+        .values_list("pk", "stock_shards")
+    )
+    to_products = defaultdict(int)
+    to_shards = defaultdict(int)
+    for r in reservations:
+        shards = sharded.get(r.product_id)
+        if shards:
+            # The product may have been re-sharded since the units were taken
+            to_shards[(r.product_id, (r.shard or 0) % shards)] += r.quantity
+        else:
+            to_products[r.product_id] += r.quantity
+
+    for product_id, units in sorted(to_products.items()):
+        Product.objects.filter(pk=product_id).update(stock_quantity=F("stock_quantity") + units)
+    for (product_id, shard), units in sorted(to_shards.items()):
+        StockShard.objects.filter(product_id=product_id, shard=shard).update(quantity=F("quantity") + units)
+    return set(to_products)
+
+
+def release_expired(now=None, chunk_size=500):
+    """
+    Expires one chunk of unpaid orders whose reservations have run out: their
+    stock is returned, their reservations deleted and ``Order.expired_at``
+    set, in one transaction. Returns the number of orders expired.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Locked so a payment for one of these orders waits for the outcome
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(
+                pk__in=StockReservation.objects.filter(expires_at__lte=now).values("order_id"),
+                expired_at__isnull=True,
+            )
+            .exclude(payments__status="PAID")
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not order_ids:
+            return 0
+        reservations = list(StockReservation.objects.filter(order_id__in=order_ids))
+        restocked = _return_stock(reservations)
+        StockReservation.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(pk__in=order_ids).update(expired_at=now)
+        schedule_catalog_invalidation(restocked)
+
+    logger.info(f"Expired {len(order_ids)} unpaid order(s), releasing {len(reservations)} reservation(s)")
+    return len(order_ids)
+
+
+def reconcile_totals():
+    """
+    Sets stock_quantity of every sharded product to the sum of its shards.
+    Returns how many products changed.
+    """
+    shard_total = Coalesce(
+        Subquery(
+            StockShard.objects.filter(product_id=OuterRef("pk"))
+            .values("product_id")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        ),
+        Value(0),
+    )
+    with transaction.atomic():
+        # Only the products whose total moved, so their cached pages stay valid
+        stale = list(
+            Product.objects.filter(stock_shards__gt=0).annotate(shard_total=shard_total)
+            .exclude(stock_quantity=F("shard_total")).values_list("pk", flat=True)
+        )
+        if stale:
+            Product.objects.filter(pk__in=stale).update(stock_quantity=shard_total)
+            schedule_catalog_invalidation(stale)
+    return len(stale)
@@ -0,0 +1,59 @@
+# store/management/commands/archive_outbox.py
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from store.outbox import archive_events, purge_archive, retention_cutoff
+
+class Command(BaseCommand):
+    help = "Moves delivered Outbox events older than the retention window into the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help="Days sent/dead events stay in the hot table (default: OUTBOX_RETENTION_DAYS or 7)"
+        )
+        parser.add_argument(
+            "--purge-after-days",
+            type=int,
+            default=None,
+            help="Also delete archived events older than this many days"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows moved per transaction"
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between chunks to limit load on the primary"
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        cutoff = retention_cutoff(options["retention_days"])
+
+        moved = 0
+        while True:
+            count = archive_events(cutoff, chunk_size)
+            moved += count
+            if count < chunk_size:
+                break
+            time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} event(s) created before {cutoff:%Y-%m-%d %H:%M}"))
+
+        if options["purge_after_days"] is not None:
+            purge_cutoff = timezone.now() - timedelta(days=options["purge_after_days"])
+            purged = 0
+            while True:
+                count = purge_archive(purge_cutoff, chunk_size)
+                purged += count
+                if count < chunk_size:
+                    break
+                time.sleep(options["pause"])
+            self.stdout.write(self.style.SUCCESS(f"Purged {purged} archived event(s)"))
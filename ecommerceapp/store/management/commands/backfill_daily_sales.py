@@ -0,0 +1,42 @@
+# store/management/commands/backfill_daily_sales.py
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from store.models import Order
+from store.rollups import rebuild_range
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily sales rollup for a date range (defaults to the whole order history)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+        parser.add_argument("--end", type=date.fromisoformat, help="Last day (YYYY-MM-DD)")
+        parser.add_argument(
+            "--days-per-chunk",
+            type=int,
+            default=31,
+            help="Days rebuilt per transaction"
+        )
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if start is None or end is None:
+            bounds = Order.objects.aggregate(first=Min("date_order"), last=Max("date_order"))
+            if bounds["first"] is None:
+                self.stdout.write("No orders to roll up.")
+                return
+            start = start or timezone.localdate(bounds["first"])
+            end = end or timezone.localdate(bounds["last"])
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        days = 0
+        chunk = timedelta(days=options["days_per_chunk"])
+        while start <= end:
+            chunk_end = min(end, start + chunk - timedelta(days=1))
+            days += rebuild_range(start, chunk_end)
+            self.stdout.write(f"Rolled up {start} .. {chunk_end}")
+            start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"Daily sales rebuilt ({days} day(s) with orders)"))
@@ -0,0 +1,50 @@
+# store/management/commands/bench_hot_sku.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from store.inventory import shard_stock
+from store.models import Customer, Order, Product
+from store.orders import InsufficientStock, place_order
+
+class Command(BaseCommand):
+    help = (
+        "Measures checkouts/s of concurrent buyers on one product, with row-locked and with sharded "
+        "stock (PostgreSQL; the bench data is deleted afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=60)
+        parser.add_argument("--stock", type=int, default=40)
+        parser.add_argument("--shards", type=int, default=16)
+
+    def _buy(self, product_id, customer):
+        try:
+            place_order([(product_id, 1)], customer=customer)
+            return True
+        except InsufficientStock:
+            return False
+        finally:
+            connection.close()
+
+    def _run(self, customer, shards, options):
+        product = Product.objects.create(name="Bench hot SKU", stock_quantity=options["stock"], current_price=10)
+        if shards:
+            shard_stock(product.id, shards)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["buyers"]) as pool:
+            sold = sum(pool.map(lambda _: self._buy(product.id, customer), range(options["buyers"])))
+        elapsed = time.perf_counter() - started
+        label = f"{shards} stock shards" if shards else "row-locked stock"
+        self.stdout.write(f"  {label:<18}: {options['buyers'] / elapsed:6.0f} checkouts/s ({sold} sold)")
+        Order.objects.filter(customer=customer).delete()
+        product.delete()
+
+    def handle(self, *args, **options):
+        customer = Customer.objects.create(first_name="Bench", last_name="Buyer", email="bench-hot-sku@example.com")
+        self.stdout.write(f"{options['buyers']} buyers, {options['stock']} units of one product")
+        try:
+            self._run(customer, 0, options)
+            self._run(customer, options["shards"], options)
+        finally:
+            customer.delete()
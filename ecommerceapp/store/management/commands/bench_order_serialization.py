@@ -0,0 +1,57 @@
+# store/management/commands/bench_order_serialization.py
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+from store.fast_serializers import ORDER_COLUMNS, serialize_orders
+from store.models import Customer, Order, OrderItem, Product
+from store.serializers import OrderSerializer
+
+class Command(BaseCommand):
+    help = "Compares per-order cost of OrderSerializer and the fast read path (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=500)
+        parser.add_argument("--items", type=int, default=5, help="Line items per order")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def _best(self, fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def handle(self, *args, **options):
+        n_orders, n_items, repeat = options["orders"], options["items"], options["repeat"]
+        request = APIRequestFactory().get("/api/v1/orders/", HTTP_HOST="localhost")
+        request.query_params = request.GET
+
+        with transaction.atomic():
+            customer = Customer.objects.create(first_name="Bench", last_name="Mark", email="bench@example.com")
+            products = Product.objects.bulk_create(
+                [Product(name=f"Bench product {i}", current_price=9.99, stock_quantity=100) for i in range(n_items)]
+            )
+            orders = Order.objects.bulk_create([Order(customer=customer, total_due=49.95) for _ in range(n_orders)])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price_at_purchase=product.current_price)
+                for order in orders for product in products
+            ])
+            ids = [order.pk for order in orders]
+
+            def drf():
+                queryset = Order.objects.filter(pk__in=ids).select_related("customer").prefetch_related("items__product")
+                return OrderSerializer(queryset, many=True, context={"request": request}).data
+
+            def fast():
+                return serialize_orders(list(Order.objects.filter(pk__in=ids).values(*ORDER_COLUMNS)), request)
+
+            before = self._best(drf, repeat)
+            after = self._best(fast, repeat)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{n_orders} orders x {n_items} items (best of {repeat}, queries included)")
+        self.stdout.write(f"  OrderSerializer : {before / n_orders * 1e6:8.1f} us/order")
+        self.stdout.write(f"  fast read path  : {after / n_orders * 1e6:8.1f} us/order")
+        self.stdout.write(self.style.SUCCESS(f"  speed-up        : {before / after:8.1f}x"))
@@ -0,0 +1,61 @@
+# store/management/commands/bench_outbox_relay.py
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from store.models import Outbox
+from store.outbox import OutboxRelay
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Stands in for the invoice service: reads the body and answers 200."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+class Command(BaseCommand):
+    help = "Measures relay throughput (events/s) against a local stub of the invoice service (events are deleted afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=5000)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.daemon_threads = True
+        # Its own process, so the stub does not compete with the relay for the GIL
+        stub = multiprocessing.get_context("fork").Process(target=server.serve_forever, daemon=True)
+        stub.start()
+        url = f"http://127.0.0.1:{server.server_port}"
+
+        self.stdout.write(f"{options['events']} GENERATE_INVOICE events, batches of {options['batch_size']}")
+        try:
+            for concurrency in options["concurrency"]:
+                ids = [event.pk for event in Outbox.objects.bulk_create([
+                    Outbox(event_type="GENERATE_INVOICE", payload={"order_id": str(n), "items": []})
+                    for n in range(options["events"])
+                ])]
+                relay = OutboxRelay(batch_size=options["batch_size"], concurrency=concurrency)
+                relay.base_url = url
+                started = time.perf_counter()
+                try:
+                    while relay.relay_batch():
+                        pass
+                finally:
+                    relay.close()
+                elapsed = time.perf_counter() - started
+                sent = Outbox.objects.filter(pk__in=ids, status="sent").count()
+                Outbox.objects.filter(pk__in=ids).delete()
+                self.stdout.write(f"  concurrency {concurrency:>3}: {sent / elapsed:8.0f} events/s ({sent} sent)")
+        finally:
+            stub.terminate()
+            server.server_close()
@@ -0,0 +1,29 @@
+# store/management/commands/export_orders.py
+from datetime import date, datetime, time, timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store.exports import export_path, order_rows, write_csv
+from store.models import Order
+
+class Command(BaseCommand):
+    help = "Exports orders (optionally with line items) to a CSV file without loading them into memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=date.fromisoformat, help="First order day (YYYY-MM-DD)")
+        parser.add_argument("--end", type=date.fromisoformat, help="Last order day (YYYY-MM-DD)")
+        parser.add_argument("--with-items", action="store_true", help="One row per line item")
+        parser.add_argument("--output", help="Destination file (default: MEDIA_ROOT/exports/...)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per cursor round trip")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by("pk")
+        if options["start"]:
+            orders = orders.filter(date_order__gte=timezone.make_aware(datetime.combine(options["start"], time.min)))
+        if options["end"]:
+            end = options["end"] + timedelta(days=1)
+            orders = orders.filter(date_order__lt=timezone.make_aware(datetime.combine(end, time.min)))
+
+        path = options["output"] or export_path(options["with_items"])
+        rows = order_rows(orders, with_items=options["with_items"], chunk_size=options["chunk_size"])
+        count = write_csv(rows, path)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} row(s) to {path}"))
@@ -0,0 +1,5 @@
+# store/management/commands/process_outbox.py
+from store.management.commands.relay_outbox import Command as RelayOutboxCommand
+
+class Command(RelayOutboxCommand):
+    help = "Deprecated alias of relay_outbox, kept for existing deployments."
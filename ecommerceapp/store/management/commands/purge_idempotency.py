@@ -0,0 +1,9 @@
+# store/management/commands/purge_idempotency.py
+from django.core.management.base import BaseCommand
+from store.idempotency import purge_expired
+
+class Command(BaseCommand):
+    help = "Deletes expired Idempotency-Key records stored in the database while the cache was down"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"Purged {purge_expired()} expired idempotency record(s)"))
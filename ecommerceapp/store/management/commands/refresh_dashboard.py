@@ -0,0 +1,23 @@
+# store/management/commands/refresh_dashboard.py
+import time
+from django.core.management.base import BaseCommand
+from store.dashboard import refresh_kpis
+
+class Command(BaseCommand):
+    help = "Recomputes the cached admin dashboard KPIs (run from cron, or with --every to loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=None,
+            help="Keep running and refresh every N seconds"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            kpis = refresh_kpis()
+            self.stdout.write(self.style.SUCCESS(f"Dashboard KPIs refreshed at {kpis['computed_at']:%H:%M:%S}"))
+            if options["every"] is None:
+                break
+            time.sleep(options["every"])
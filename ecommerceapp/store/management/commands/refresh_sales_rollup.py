@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from store.rollups import refresh_pending
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily sales rollup for the days touched since the last pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days-per-chunk",
+            type=int,
+            default=31,
+            help="Days rebuilt per transaction"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30,
+            help="Seconds between passes when running continuously"
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run a single pass and exit"
+        )
+
+    def handle(self, *args, **options):
+        chunk = options["days_per_chunk"]
+        while True:
+            refreshed = 0
+            while True:
+                count = refresh_pending(limit=chunk)
+                refreshed += count
+                if count < chunk:
+                    break
+            if refreshed:
+                self.stdout.write(f"Refreshed {refreshed} day(s) of the sales rollup")
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,83 @@
+# store/management/commands/relay_outbox.py
+import time
+import logging
+from django.core.management.base import BaseCommand
+from store.outbox import OutboxListener, OutboxRelay
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Relays pending Outbox events to the microservices (safe to run as several replicas)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of events claimed per batch"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Maximum number of in-flight HTTP requests"
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=5,
+            help="Per-request timeout in seconds"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Polling interval in seconds when the outbox is empty "
+                 "(default 0.5, or 5 as a fallback when LISTEN/NOTIFY is available)"
+        )
+        parser.add_argument(
+            "--no-listen",
+            action="store_true",
+            help="Poll even on PostgreSQL instead of waiting for NOTIFY"
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox and exit instead of polling forever"
+        )
+
+    def handle(self, *args, **options):
+        relay = OutboxRelay(
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            timeout=options["timeout"],
+        )
+        listener = OutboxListener()
+        if options["no_listen"] or not listener.enabled:
+            listener = None
+        else:
+            # Subscribe before the first drain so no commit slips in between
+            listener.listen()
+        interval = options["interval"] or (5.0 if listener else 0.5)
+
+        self.stdout.write(self.style.SUCCESS("Starting Outbox Relayer..."))
+
+        try:
+            while True:
+                handled = relay.relay_batch()
+                if handled:
+                    logger.info(f"Relayed {handled} event(s)")
+                    continue
+                if options["once"]:
+                    break
+                if listener:
+                    listener.wait(interval)
+                else:
+                    time.sleep(interval)
+
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Outbox Relayer stopped gracefully."))
+        finally:
+            relay.close()
+            if listener:
+                listener.close()
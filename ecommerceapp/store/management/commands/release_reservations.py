@@ -0,0 +1,42 @@
+# store/management/commands/release_reservations.py
+import time
+from django.core.management.base import BaseCommand
+from store.inventory import reconcile_totals, release_expired
+
+class Command(BaseCommand):
+    help = "Expires unpaid orders whose reservations ran out, returning their stock, and reconciles sharded stock totals"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Orders expired per transaction"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Seconds between passes when running continuously"
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run a single pass and exit"
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        while True:
+            expired = 0
+            while True:
+                count = release_expired(chunk_size=chunk_size)
+                expired += count
+                if count < chunk_size:
+                    break
+            reconciled = reconcile_totals()
+            self.stdout.write(f"Expired {expired} unpaid order(s), reconciled {reconciled} sharded product(s)")
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,40 @@
+# store/management/commands/run_export_jobs.py
+import time
+from django.core.management.base import BaseCommand
+from store.exports import claim_export_job, run_export_job
+
+class Command(BaseCommand):
+    help = "Writes the order exports queued from the admin (ExportJob rows)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds between polls when the queue is empty"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Orders fetched per query"
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the queued jobs and exit"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_export_job()
+            if job is not None:
+                if run_export_job(job, chunk_size=options["chunk_size"]):
+                    self.stdout.write(f"Export {job.pk} written to {job.path}")
+                else:
+                    self.stderr.write(f"Export {job.pk} failed, see its ExportJob row")
+                continue
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -3,17 +3,17 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.utils import timezone
-from django.db.models import Sum
 from datetime import timedelta
-from store.models import Order, Product
+from store.models import DailySales, Product
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
-        last_week = timezone.now() - timedelta(days=7)
+        today = timezone.localdate()
         
-        # 1. Gather Data
-        total_sales = Order.objects.filter(complete=True, date_order__gte=last_week).aggregate(Sum('total_due'))['total_due__sum'] or 0
-        order_count = Order.objects.filter(date_order__gte=last_week).count()
+        # 1. Gather Data (from the daily sales rollup)
+        week = DailySales.objects.totals(today - timedelta(days=6), today)
+        total_sales = week['revenue']
+        order_count = week['order_count']
         low_stock_count = Product.objects.filter(stock_quantity__lt=5).count()
 
         # 2. Render HTML
@@ -1,23 +1,21 @@
 import logging
-import json
-from django.conf import settings
-from django.core.cache import cache
-from django.http import JsonResponse
+import zlib
+from django.http import HttpResponse, JsonResponse
 from rest_framework import status
+from store import idempotency
 
 logger = logging.getLogger(__name__)
 
 class IdempotencyMiddleware:
     """
     Middleware to enforce idempotency for state-changing requests (POST, PUT, PATCH).
-    Uses an Idempotency-Key header to ensure duplicate requests return the same response.
+    Uses an Idempotency-Key header to ensure duplicate requests return the same response:
+    the original status, headers and body are replayed byte for byte. Storage is
+    described in store/idempotency.py.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
-        # Configurable TTLs via settings
-        self.lock_ttl = getattr(settings, "IDEMPOTENCY_LOCK_TTL", 60)       # 1 minute lock
-        self.response_ttl = getattr(settings, "IDEMPOTENCY_RESPONSE_TTL", 86400)  # 24 hours
 
     def __call__(self, request):
         # 1. Only apply to POST/PUT/PATCH (state-changing methods)
@@ -28,46 +26,57 @@ class IdempotencyMiddleware:
         if not key:
             return self.get_response(request)
 
-        lock_key = f"idemp_lock_{key}"
-        resp_key = f"idemp_resp_{key}"
+        # 2. Atomic claim of the key
+        fingerprint = idempotency.fingerprint(request)
+        store, entry = idempotency.claim(key, fingerprint)
 
-        # 2. Atomic lock check
-        is_new_request = cache.add(lock_key, "LOCKED", timeout=self.lock_ttl)
+        if entry is not None:
+            return self.repeat(key, fingerprint, entry)
 
-        if not is_new_request:
-            cached_data = cache.get(resp_key)
-            if cached_data:
-                logger.info(f"Idempotency hit for key={key}")
-                return JsonResponse(cached_data, status=status.HTTP_200_OK)
+        # 3. Process the request
+        try:
+            response = self.get_response(request)
+        except Exception:
+            store.release(key)
+            raise
+
+        # 4. Keep successful or client-error responses (<500); let a 5xx be retried
+        if response.status_code >= 500:
+            store.release(key)
+            return response
+        try:
+            store.save(key, idempotency.entry_for(fingerprint, response))
+            logger.info(f"Stored idempotent response for key={key}")
+        except Exception as e:
+            logger.error(f"Failed to store response for key={key}: {e}")
+            store.release(key)
+        return response
+
+    def repeat(self, key, fingerprint, entry):
+        if entry.fingerprint != fingerprint:
+            logger.warning(f"Idempotency key reused with a different request: key={key}")
+            return JsonResponse(
+                {"error": "Idempotency-Key was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
 
-            # If locked but no response yet, request is still in flight
+        if entry.status is None:
+            # If claimed but no response yet, request is still in flight
             logger.warning(f"Duplicate request in flight for key={key}")
             return JsonResponse(
                 {"error": "Request already in progress. Please wait."},
                 status=status.HTTP_409_CONFLICT
             )
 
-        # 3. Process the request
-        try:
-            response = self.get_response(request)
-
-            # 4. Cache successful or client-error responses (<500)
-            if response.status_code < 500:
-                try:
-                    if hasattr(response, "data"):
-                        response_data = response.data
-                    else:
-                        # Fallback for non-DRF responses
-                        try:
-                            response_data = json.loads(response.content.decode("utf-8"))
-                        except Exception:
-                            response_data = {"raw": response.content.decode("utf-8")}
-                    cache.set(resp_key, response_data, timeout=self.response_ttl)
-                    logger.info(f"Cached idempotent response for key={key}")
-                except Exception as e:
-                    logger.error(f"Failed to cache response for key={key}: {e}")
+        if entry.body is None:
+            return JsonResponse(
+                {"error": "Request already processed; its response is too large to replay."},
+                status=status.HTTP_409_CONFLICT
+            )
 
-            return response
-        finally:
-            # Clean up the lock, keep the cached response
-            cache.delete(lock_key)
+        logger.info(f"Idempotency hit for key={key}")
+        response = HttpResponse(zlib.decompress(entry.body), status=entry.status)
+        for name, value in entry.headers:
+            response[name] = value
+        response["Idempotent-Replayed"] = "true"
+        return response
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Wakes LISTENing outbox relays when Outbox rows are committed. NOTIFY is
+# transactional, so relays only hear about rows that are actually visible.
+# A statement-level trigger sends one notification per INSERT, bulk or not.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION store_outbox_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('store_outbox', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER store_outbox_notify
+AFTER INSERT ON store_outbox
+FOR EACH STATEMENT EXECUTE FUNCTION store_outbox_notify();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS store_outbox_notify ON store_outbox;
+DROP FUNCTION IF EXISTS store_outbox_notify();
+"""
+
+
+def create_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_employeelink_invoicelink'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
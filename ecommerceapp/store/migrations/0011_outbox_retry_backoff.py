@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_outbox_notify_trigger'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outbox',
+            name='store_outbo_status_476a36_idx',
+        ),
+        migrations.AddField(
+            model_name='outbox',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='outbox',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='outbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='outbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('dead', 'Dead letter')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='outbox',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'failed'])), fields=['next_attempt_at'], name='store_outbox_due_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:11
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# PostgreSQL only: a trigger keeps search_vector current for every write path
+# (API, admin list_editable, bulk updates), a GIN index serves the @@ match and
+# a trigram index on name serves typo-tolerant fallback matching.
+CREATE_SEARCH = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION store_product_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER store_product_search_vector
+BEFORE INSERT OR UPDATE OF name, description ON store_product
+FOR EACH ROW EXECUTE FUNCTION store_product_search_vector();
+
+UPDATE store_product SET name = name;
+
+CREATE INDEX store_product_search_vector_gin ON store_product USING gin (search_vector);
+CREATE INDEX store_product_name_trgm ON store_product USING gin (name gin_trgm_ops);
+"""
+
+DROP_SEARCH = """
+DROP INDEX IF EXISTS store_product_name_trgm;
+DROP INDEX IF EXISTS store_product_search_vector_gin;
+DROP TRIGGER IF EXISTS store_product_search_vector ON store_product;
+DROP FUNCTION IF EXISTS store_product_search_vector();
+"""
+
+
+def create_search(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSalesDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
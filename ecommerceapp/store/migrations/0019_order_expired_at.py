@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_pendingsalesday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='expired_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
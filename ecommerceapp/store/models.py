@@ -1,9 +1,16 @@
-from django.db import models
+import random
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import DecimalField, F, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-import requests
-import json
 
 # --- 1. EXTERNAL SERVICE LINK MODELS (Proxy/Dummy) ---
 class EmployeeLink(models.Model):
@@ -31,27 +38,163 @@ class Customer(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 class Product(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, db_index=True)
     description = models.TextField(blank=True)
     current_price = models.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = models.PositiveIntegerField(default=0)
+    # Weighted name/description tsvector, kept current by a PostgreSQL trigger
+    # (migration 0015). Always NULL on other databases.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Hot products keep their stock in this many StockShard rows so concurrent
+    # checkouts do not queue on this row; 0 means stock_quantity is the stock.
+    # For sharded products stock_quantity is only the last reconciled total,
+    # so it is read-only there; both are changed through store/inventory.py.
+    stock_shards = models.PositiveSmallIntegerField(default=0)
 
     def __str__(self):
         return self.name
 
 
+class StockShard(models.Model):
+    """One slice of a hot product's stock (see store/inventory.py)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="shards")
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "shard"], name="store_stockshard_product_shard_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}#{self.shard}: {self.quantity}"
+
+
 # --- 3. ORDERING LOGIC ---
+class OrderQuerySet(models.QuerySet):
+    def order_days(self):
+        """Distinct calendar days (current time zone) the orders were placed on."""
+        return set(self.annotate(day=TruncDate("date_order")).values_list("day", flat=True).distinct())
+
+    def recalculate_totals(self, order_ids=None, batch_size=1000):
+        """
+        Recomputes total_due from the line items with set-based UPDATEs
+        (one per ``batch_size`` orders). Recalculates every order in the
+        queryset when ``order_ids`` is None; returns the number of rows updated.
+        """
+        line_totals = (
+            OrderItem.objects.using(self.db)
+            .filter(order=OuterRef("pk"))
+            .values("order")
+            .annotate(total=Sum(F("price_at_purchase") * F("quantity")))
+            .values("total")
+        )
+        total_due = Coalesce(
+            Subquery(line_totals),
+            Value(Decimal("0")),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+        if order_ids is None:
+            return self.update(total_due=total_due)
+
+        order_ids = list(order_ids)
+        updated = 0
+        for start in range(0, len(order_ids), batch_size):
+            batch = order_ids[start:start + batch_size]
+            updated += self.filter(pk__in=batch).update(total_due=total_due)
+        return updated
+
+
+class _CommitBatch:
+    """Values collected during a transaction and handed to ``flush`` once it commits."""
+
+    def __init__(self, flush):
+        self.flush = flush
+        self.values = set()
+        self.flushed = False
+
+    def __call__(self):
+        self.flushed = True
+        self.flush(self.values)
+
+
+def _collect_until_commit(name, flush, values, using):
+    """
+    Adds ``values`` to the ``name`` batch of the current transaction; ``flush``
+    receives the whole set once, on commit. Outside a transaction it runs at once.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        flush(set(values))
+        return
+
+    attr = f"_pending_{name}"
+    batch = getattr(connection, attr, None)
+    # A rollback (or savepoint rollback) discards the callback, so start over
+    if batch is None or batch.flushed or not any(func is batch for _, func, _ in connection.run_on_commit):
+        batch = _CommitBatch(flush)
+        setattr(connection, attr, batch)
+        transaction.on_commit(batch, using=using)
+    batch.values.update(values)
+
+
+def schedule_total_recalculation(order_id, using=None):
+    """
+    Coalesces total_due recalculation for ``order_id`` into a single UPDATE
+    per transaction. Outside a transaction the total is recalculated at once.
+    """
+    using = using or DEFAULT_DB_ALIAS
+
+    def flush(order_ids):
+        orders = Order.objects.using(using)
+        orders.recalculate_totals(order_ids)
+        # Totals feed the daily sales rollup
+        schedule_sales_rollup(orders.filter(pk__in=order_ids).order_days(), using=using)
+
+    _collect_until_commit("totals", flush, [order_id], using)
+
+
+def schedule_sales_rollup(days, using=None):
+    """Marks ``days`` for the rollup refresher once the transaction commits."""
+    using = using or DEFAULT_DB_ALIAS
+
+    def flush(pending_days):
+        from store.rollups import mark_pending
+        mark_pending(pending_days, using=using)
+
+    _collect_until_commit("sales_days", flush, days, using)
+
+
+def schedule_catalog_invalidation(product_ids, listing=False, using=None):
+    """
+    Invalidates the cached catalog responses (store/catalog.py) holding any of
+    ``product_ids`` once, on commit; ``listing`` drops every list page as well.
+    """
+    using = using or DEFAULT_DB_ALIAS
+
+    def flush(values):
+        from store.catalog import invalidate
+        # None stands for "listing" among the product ids
+        invalidate([value for value in values if value is not None], listing=None in values)
+
+    _collect_until_commit("catalog", flush, [*product_ids, *([None] if listing else [])], using)
+
+
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders")
-    date_order = models.DateTimeField(auto_now_add=True)
+    date_order = models.DateTimeField(auto_now_add=True, db_index=True)
     complete = models.BooleanField(default=False)
     transaction_id = models.CharField(max_length=100, null=True, blank=True)
     total_due = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Set when the order went unpaid past STOCK_RESERVATION_TTL and its stock
+    # was returned (store/inventory.py); paying it later takes the stock again.
+    expired_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OrderQuerySet.as_manager()
 
     def update_total_due(self):
-        total = sum(item.get_total() for item in self.items.all())
-        self.total_due = total
-        self.save(update_fields=["total_due"])
+        Order.objects.filter(pk=self.pk).recalculate_totals()
+        self.refresh_from_db(fields=["total_due"])
 
     def __str__(self):
         return f"Order {self.id} - {self.customer}"
@@ -66,7 +209,14 @@ class OrderItem(models.Model):
         if not self.price_at_purchase:
             self.price_at_purchase = self.product.current_price
         super().save(*args, **kwargs)
-        self.order.update_total_due()
+        schedule_total_recalculation(self.order_id, using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        order_id = self.order_id
+        using = self._state.db
+        result = super().delete(*args, **kwargs)
+        schedule_total_recalculation(order_id, using=using)
+        return result
 
     def get_total(self):
         return self.price_at_purchase * self.quantity
@@ -75,13 +225,30 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
 
+class StockReservation(models.Model):
+    """
+    Stock taken by an unpaid order. Paying the order confirms (deletes) its
+    reservations; ``manage.py release_reservations`` returns the stock of
+    reservations that expire first and marks their order expired.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="reservations")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    # StockShard.shard the units came from; NULL when taken from stock_quantity
+    shard = models.PositiveSmallIntegerField(null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id}"
+
+
 # --- 4. FULFILLMENT & PAYMENTS ---
 class Payment(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="payments")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     method = models.CharField(max_length=50) 
     status = models.CharField(max_length=20, default="pending")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
         return f"Payment {self.id} - Order {self.order.id} ({self.status})"
@@ -102,55 +269,276 @@ class Outbox(models.Model):
         ("pending", "Pending"),
         ("sent", "Sent"),
         ("failed", "Failed"),
+        ("dead", "Dead letter"),
     ]
+    # Statuses the relay still has to deliver
+    DELIVERABLE_STATUSES = ["pending", "failed"]
 
     id = models.BigAutoField(primary_key=True)
     event_type = models.CharField(max_length=100)
     payload = models.JSONField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=["status", "created_at"]),
+            # Only rows still awaiting delivery are indexed, so the relay's
+            # claim query stays proportional to due events, not history.
+            models.Index(
+                fields=["next_attempt_at"],
+                name="store_outbox_due_idx",
+                condition=Q(status__in=["pending", "failed"]),
+            ),
         ]
 
+    def mark_sent(self, now):
+        self.status = "sent"
+        self.processed_at = now
+        self.last_error = ""
+
+    def mark_failed(self, error, now):
+        """
+        Records a failed attempt and schedules the next one with jittered
+        exponential backoff, or dead-letters the event once
+        OUTBOX_MAX_ATTEMPTS is reached.
+        """
+        max_attempts = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 10)
+        base = getattr(settings, "OUTBOX_BACKOFF_BASE", 2)      # seconds
+        cap = getattr(settings, "OUTBOX_BACKOFF_CAP", 3600)     # 1 hour
+
+        self.attempts += 1
+        self.last_error = str(error)[:1000]
+        if self.attempts >= max_attempts:
+            self.status = "dead"
+            self.processed_at = now
+            return
+
+        delay = min(cap, base * 2 ** (self.attempts - 1))
+        # "Equal jitter": keeps at least half the delay, spreads the rest so
+        # events that failed together don't retry together.
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.status = "failed"
+        self.next_attempt_at = now + timedelta(seconds=delay)
+
     def __str__(self):
         return f"Outbox Event {self.id} - {self.event_type} ({self.status})"
 
 
-# --- 6. SIGNALS FOR AUTOMATION ---
+class OutboxArchive(models.Model):
+    """
+    Delivered (or dead-lettered) Outbox events moved out of the hot table by
+    the ``archive_outbox`` command. Keeps the original event id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=Outbox.STATUS_CHOICES)
+    created_at = models.DateTimeField(db_index=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Statuses that may leave the hot table
+    ARCHIVABLE_STATUSES = ["sent", "dead"]
+    ARCHIVED_FIELDS = ["id", "event_type", "payload", "status", "created_at", "processed_at", "attempts", "last_error"]
+
+    def __str__(self):
+        return f"Archived Outbox Event {self.id} - {self.event_type} ({self.status})"
+
+
+# --- 6. REPORTING ROLLUPS ---
+class DailySalesQuerySet(models.QuerySet):
+    def window(self, start, end):
+        """Rows for ``start``..``end`` inclusive, oldest first."""
+        return self.filter(date__gte=start, date__lte=end).order_by("date")
+
+    def totals(self, start=None, end=None):
+        rows = self
+        if start is not None:
+            rows = rows.filter(date__gte=start)
+        if end is not None:
+            rows = rows.filter(date__lte=end)
+        totals = rows.aggregate(
+            revenue=Sum("revenue"),
+            order_count=Sum("order_count"),
+            completed_order_count=Sum("completed_order_count"),
+            units_sold=Sum("units_sold"),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+
+class DailySales(models.Model):
+    """
+    One row per calendar day, maintained by store/rollups.py.
+    ``revenue`` counts completed orders only; counts and units cover every order.
+    """
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    completed_order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DailySalesQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+
+    def __str__(self):
+        return f"Sales {self.date}: {self.revenue}"
+
+
+class DailyProductSalesQuerySet(models.QuerySet):
+    def top_products(self, start=None, end=None, limit=5):
+        rows = self
+        if start is not None:
+            rows = rows.filter(date__gte=start)
+        if end is not None:
+            rows = rows.filter(date__lte=end)
+        return (
+            rows.values("product__name")
+            .annotate(total_sold=Sum("units_sold"))
+            .order_by("-total_sold")[:limit]
+        )
+
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = DailyProductSalesQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "Daily product sales"
+        constraints = [
+            models.UniqueConstraint(fields=["date", "product"], name="store_dailyproductsales_unique_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}: {self.units_sold}"
+
+
+class PendingSalesDay(models.Model):
+    """
+    A day whose rollup rows are out of date. Commits only insert these
+    markers; ``manage.py refresh_sales_rollup`` rebuilds the days and deletes them.
+    """
+    date = models.DateField(primary_key=True)
+
+    def __str__(self):
+        return f"Pending rollup {self.date}"
+
+
+# --- 7. IDEMPOTENCY ---
+class IdempotencyRecord(models.Model):
+    """
+    Idempotency-Key entries kept in the database while the cache is
+    unreachable (see store/idempotency.py). ``status_code`` is NULL while the
+    original request is still in flight; ``body`` is zlib-compressed.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    headers = models.JSONField(default=list)
+    body = models.BinaryField(null=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in flight'})"
+
+
+# --- 8. BACKGROUND EXPORTS ---
+class ExportJob(models.Model):
+    """
+    An order CSV export requested from the admin. ``manage.py run_export_jobs``
+    writes the file outside the web workers and records the outcome here.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    order_ids = models.JSONField()
+    with_items = models.BooleanField(default=False)
+    path = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True)
+    row_count = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Export {self.id} ({self.status})"
+
+
+# --- 9. SIGNALS FOR AUTOMATION ---
+
+def enqueue_invoice(payment_id):
+    """
+    Records a GENERATE_INVOICE Outbox event for a paid payment. The order,
+    customer and line items are read in one go; delivery is left to the relay.
+    """
+    payment = (
+        Payment.objects.select_related("order__customer")
+        .prefetch_related(Prefetch("order__items", queryset=OrderItem.objects.select_related("product")))
+        .filter(pk=payment_id)
+        .first()
+    )
+    if payment is None:
+        return None
+
+    order = payment.order
+    payload = {
+        "order_id": str(order.id),
+        "customer_name": f"{order.customer.first_name} {order.customer.last_name}",
+        "amount": float(payment.amount),
+        "items": [
+            {"name": i.product.name, "price": float(i.price_at_purchase), "quantity": i.quantity}
+            for i in order.items.all()
+        ]
+    }
+    return Outbox.objects.create(event_type='GENERATE_INVOICE', payload=payload)
+
 
 @receiver(post_save, sender=Payment)
 def trigger_invoice_on_payment(sender, instance, created, **kwargs):
     """
-    Automatically triggers the Invoice Microservice when a payment is marked 'success'.
-    It also creates an Outbox entry for reliability.
+    Queues the Invoice Microservice when a payment is marked 'PAID'.
+    Only an Outbox row is written (after the payment commits), so a slow or
+    offline invoice service never delays the payment write itself.
     """
     if instance.status == 'PAID':
-        payload = {
-            "order_id": str(instance.order.id),
-            "customer_name": f"{instance.order.customer.first_name} {instance.order.customer.last_name}",
-            "amount": float(instance.amount),
-            "items": [
-                {"name": i.product.name, "price": float(i.price_at_purchase)} 
-                for i in instance.order.items.all()
-            ]
-        }
-        
-        # 1. Immediate Attempt (FastAPI trigger)
-        try:
-            requests.post("http://invoice_service:8001/generate-invoice/", json=payload, timeout=5)
-            status_for_outbox = "sent"
-            print(f"✅ Automatically generated invoice for Order {instance.order.id}")
-        except Exception as e:
-            status_for_outbox = "failed"
-            print(f"❌ Failed to auto-generate invoice: {e}")
-
-        # 2. Record in Outbox (Audit Trail/Retry logic)
-        Outbox.objects.create(
-            event_type='GENERATE_INVOICE',
-            payload=payload,
-            status=status_for_outbox
-        )
\ No newline at end of file
+        using = kwargs.get("using") or DEFAULT_DB_ALIAS
+        # An order that expired unpaid gave its stock back: take it again, or
+        # fail the payment with InsufficientStock if it has been sold meanwhile
+        from store.orders import reinstate_order
+        reinstate_order(instance.order_id)
+        # Paid orders keep their stock for good
+        StockReservation.objects.using(using).filter(order_id=instance.order_id).delete()
+        transaction.on_commit(partial(enqueue_invoice, instance.pk), using=using)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def refresh_sales_rollup(sender, instance, **kwargs):
+    using = kwargs.get("using") or DEFAULT_DB_ALIAS
+    day = timezone.localdate(instance.date_order)
+    schedule_sales_rollup([day], using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_catalog(sender, instance, **kwargs):
+    # Covers the API, admin list_editable and any other Product.save(); a new,
+    # renamed or repriced product can move between list pages
+    schedule_catalog_invalidation([instance.pk], listing=True, using=kwargs.get("using"))
@@ -0,0 +1,326 @@
+# store/orders.py
+"""
+Order placement engine.
+
+Stock is validated and decremented by the same statement, one conditional
+``UPDATE ... FROM`` over a ``VALUES`` list of ``(product_id, quantity)`` for
+the whole cart: ``SET stock_quantity = stock_quantity - v.quantity WHERE id =
+v.product_id AND stock_quantity >= v.quantity RETURNING id, name,
+current_price``. On PostgreSQL the rows are first locked in pk order inside
+the same statement, so concurrent checkouts take row locks in the same
+sequence (no deadlocks). Nothing is read beforehand, so there is no window
+between the check and the write. Products missing from the returned ids are
+then looked up once to tell "out of stock" from "does not exist" (or from
+sharded stock).
+
+Checkout is therefore a fixed number of round trips whatever the cart size:
+the stock UPDATE, one INSERT for the order, one ``bulk_create`` for the line
+items, one for the stock reservations and one INSERT for the outbox event.
+
+Hot products with sharded stock (see store/inventory.py) take their units
+from a free StockShard row instead, at two extra queries per such product.
+
+``place_orders`` is the bulk variant used by the order import: it locks and
+checks stock for a whole batch of carts at once and writes every order, line
+item, reservation and outbox event with one ``bulk_create`` per table.
+"""
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from store.inventory import available, reserve, reserve_many, take_from_shards
+from store.models import (
+    Order,
+    OrderItem,
+    Outbox,
+    Product,
+    StockShard,
+    schedule_catalog_invalidation,
+    schedule_sales_rollup,
+)
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when one or more lines of a cart cannot be fulfilled. ``errors``
+    holds one dict per failing product: ``product_id``, ``detail`` and, when
+    the product exists, ``product``, ``requested`` and ``available``.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(error["detail"] for error in errors))
+
+
+def _merge_quantities(lines):
+    """Sums the requested quantity per product (a cart may repeat a product)."""
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def _decrement_sql(count):
+    table = connection.ops.quote_name(Product._meta.db_table)
+    values = ", ".join(["(%s, %s)"] * count)
+    ctes = f"v (product_id, quantity) AS (VALUES {values})"
+    locked = ""
+    if connection.features.has_select_for_update:
+        # Lock the rows in pk order before any is updated
+        ctes += (
+            f", locked AS MATERIALIZED (SELECT id FROM {table} "
+            f"WHERE id IN (SELECT product_id FROM v) ORDER BY id FOR UPDATE)"
+        )
+        locked = "AND id IN (SELECT id FROM locked) "
+    return (
+        f"WITH {ctes} "
+        f"UPDATE {table} SET stock_quantity = stock_quantity - v.quantity FROM v "
+        f"WHERE id = v.product_id AND stock_shards = 0 AND stock_quantity >= v.quantity {locked}"
+        f"RETURNING id, name, current_price"
+    )
+
+
+def _decrement_stock(quantities):
+    """
+    Decrements each unsharded product's stock if it has enough, in a single
+    statement. Returns ``{product_id: (name, current_price)}`` for the
+    products updated; the others (short, sharded or missing) are left
+    untouched.
+    """
+    if not quantities:
+        return {}
+    params = []
+    for product_id in sorted(quantities):
+        params += [product_id, quantities[product_id]]
+    price_field = Product._meta.get_field("current_price")
+    with connection.cursor() as cursor:
+        cursor.execute(_decrement_sql(len(quantities)), params)
+        return {
+            product_id: (name, price_field.to_python(price))
+            for product_id, name, price in cursor.fetchall()
+        }
+
+
+def _out_of_stock(product, requested, available_units):
+    return {
+        "product_id": product.pk,
+        "product": product.name,
+        "requested": requested,
+        "available": available_units,
+        "detail": f"Not enough stock for {product.name}. "
+                  f"Requested: {requested}, Available: {available_units}",
+    }
+
+
+def _take_stock(quantities):
+    """
+    Takes ``{product_id: quantity}`` from plain stock or shards inside the
+    current transaction. Returns ``(prices, takes, sharded)``: ``{product_id:
+    (name, current_price)}``, the shard takes for ``reserve`` and the sharded
+    product ids. Raises InsufficientStock (the caller's transaction rolls the
+    partial decrements back) if any product falls short.
+    """
+    # Validate and decrement all plain stock in one statement
+    prices = _decrement_stock(quantities)
+
+    # Whatever did not update is sharded, short or unknown
+    others = list(Product.objects.filter(pk__in=set(quantities) - set(prices)).order_by("pk"))
+    errors = []
+    takes = []
+    sharded = set()
+    for product in others:
+        requested = quantities[product.pk]
+        if not product.stock_shards:
+            errors.append(_out_of_stock(product, requested, product.stock_quantity))
+            continue
+        taken = take_from_shards(product.pk, requested)
+        if taken is None:
+            errors.append(_out_of_stock(product, requested, available(product.pk)))
+            continue
+        prices[product.pk] = (product.name, product.current_price)
+        sharded.add(product.pk)
+        takes += [(product.pk, shard, units) for shard, units in taken]
+
+    missing = set(quantities) - set(prices) - {product.pk for product in others}
+    errors += [
+        {"product_id": product_id, "detail": f"Product {product_id} does not exist."}
+        for product_id in sorted(missing)
+    ]
+    if errors:
+        # Rolls back every decrement made above
+        raise InsufficientStock(errors)
+    return prices, takes, sharded
+
+
+def place_order(lines, **order_fields):
+    """
+    Creates an Order from ``lines`` — an iterable of ``(product_id, quantity)`` —
+    and returns it. ``order_fields`` are passed straight to the Order (customer,
+    transaction_id, ...). Raises InsufficientStock and leaves the database
+    untouched if any line cannot be fulfilled.
+    """
+    lines = list(lines)
+    quantities = _merge_quantities(lines)
+
+    with transaction.atomic():
+        # 1. Validate and take the stock
+        prices, takes, sharded = _take_stock(quantities)
+
+        # 2. Price the cart in memory
+        line_items = [
+            OrderItem(product_id=product_id, quantity=quantity, price_at_purchase=prices[product_id][1])
+            for product_id, quantity in lines
+        ]
+        total_due = sum(item.get_total() for item in line_items)
+
+        # 3. Persist the order, its items and its stock reservations
+        order = Order.objects.create(total_due=total_due, **order_fields)
+        for item in line_items:
+            item.order = order
+        OrderItem.objects.bulk_create(line_items)
+        reserve(order, takes + [(pk, None, qty) for pk, qty in quantities.items() if pk not in sharded])
+
+        # Raw updates send no signals, so the cached catalog is told directly;
+        # sharded products' displayed stock only changes when reconciled
+        schedule_catalog_invalidation(set(quantities) - sharded)
+
+        # 4. Log the Outbox Event
+        _outbox_event(order).save()
+
+    return order
+
+
+def reinstate_order(order_id):
+    """
+    Takes the stock of an order that expired unpaid (see
+    ``inventory.release_expired``) again, for a payment that arrived late.
+    Does nothing for an order that has not expired. Raises InsufficientStock
+    if the stock has been sold meanwhile. The order row is locked first,
+    expired or not: if ``release_expired`` is expiring it right now, this
+    waits for that to commit and then sees the new ``expired_at``.
+    """
+    with transaction.atomic():
+        expired_at = (
+            Order.objects.select_for_update().filter(pk=order_id)
+            .values_list("expired_at", flat=True).first()
+        )
+        if expired_at is None:
+            return False
+        quantities = _merge_quantities(OrderItem.objects.filter(order_id=order_id).values_list("product_id", "quantity"))
+        _, _, sharded = _take_stock(quantities)
+        Order.objects.filter(pk=order_id).update(expired_at=None)
+        schedule_catalog_invalidation(set(quantities) - sharded)
+    return True
+
+
+def _outbox_event(order):
+    return Outbox(
+        event_type="ORDER_PLACED",
+        payload={
+            "order_id": order.id,
+            "total_due": str(order.total_due),
+            "customer_email": order.customer.email if order.customer else None,
+        },
+    )
+
+
+def place_orders(carts):
+    """
+    Places many orders at once. ``carts`` is a list of ``(lines, order_fields)``
+    as taken by ``place_order``. Returns a list in the same order holding
+    either the created Order or the InsufficientStock-style error dicts for
+    that cart; a failed cart does not affect the others.
+
+    Stock is locked set-wise (every plain product in one ordered
+    ``SELECT ... FOR UPDATE``, every shard of the sharded ones in another),
+    allocated to the carts in order in memory and written back with one
+    UPDATE per table. ``bulk_create`` sends no signals, so the sales rollup
+    and catalog cache are scheduled explicitly.
+    """
+    merged = [_merge_quantities(lines) for lines, _ in carts]
+    product_ids = set().union(*merged)
+
+    with transaction.atomic():
+        products = {product.pk: product for product in Product.objects.filter(pk__in=product_ids)}
+        plain = [pk for pk, product in products.items() if not product.stock_shards]
+        stock = dict(
+            Product.objects.select_for_update().filter(pk__in=plain, stock_shards=0)
+            .order_by("pk").values_list("pk", "stock_quantity")
+        )
+        shards = {}
+        for shard in (
+            StockShard.objects.select_for_update()
+            .filter(product_id__in=set(products) - set(plain)).order_by("product_id", "shard")
+        ):
+            shards.setdefault(shard.product_id, []).append(shard)
+        for product_id, product_shards in shards.items():
+            stock[product_id] = sum(shard.quantity for shard in product_shards)
+        initial = dict(stock)
+
+        # 1. Allocate stock to the carts in order
+        results = []
+        for quantities in merged:
+            errors = []
+            for product_id, quantity in sorted(quantities.items()):
+                if product_id not in stock:
+                    errors.append({"product_id": product_id, "detail": f"Product {product_id} does not exist."})
+                elif stock[product_id] < quantity:
+                    errors.append(_out_of_stock(products[product_id], quantity, stock[product_id]))
+            if not errors:
+                for product_id, quantity in quantities.items():
+                    stock[product_id] -= quantity
+            results.append(errors or None)
+
+        accepted = [n for n, errors in enumerate(results) if errors is None]
+        if not accepted:
+            return results
+
+        # 2. Write the stock back
+        changed = [pk for pk in stock if stock[pk] != initial[pk]]
+        changed_plain = [pk for pk in changed if pk not in shards]
+        if changed_plain:
+            Product.objects.filter(pk__in=changed_plain).update(stock_quantity=Case(
+                *(When(pk=pk, then=Value(stock[pk])) for pk in changed_plain),
+                output_field=IntegerField(),
+            ))
+        drained = []
+        for product_id in (pk for pk in changed if pk in shards):
+            remaining = initial[product_id] - stock[product_id]
+            for shard in shards[product_id]:
+                units = min(shard.quantity, remaining)
+                shard.quantity -= units
+                remaining -= units
+                drained.append(shard)
+        if drained:
+            StockShard.objects.bulk_update(drained, ["quantity"])
+
+        # 3. Orders, line items, reservations and outbox events
+        orders = []
+        line_items = []
+        for n in accepted:
+            lines, order_fields = carts[n]
+            items = [
+                OrderItem(product_id=pk, quantity=quantity, price_at_purchase=products[pk].current_price)
+                for pk, quantity in lines
+            ]
+            order = Order(total_due=sum(item.get_total() for item in items), **order_fields)
+            orders.append(order)
+            line_items.append(items)
+        Order.objects.bulk_create(orders)
+
+        for order, items in zip(orders, line_items):
+            for item in items:
+                item.order = order
+        OrderItem.objects.bulk_create([item for items in line_items for item in items])
+        reserve_many([
+            (order, [(pk, None, quantity) for pk, quantity in merged[n].items()])
+            for n, order in zip(accepted, orders)
+        ])
+        Outbox.objects.bulk_create([_outbox_event(order) for order in orders])
+
+        schedule_sales_rollup({timezone.localdate(order.date_order) for order in orders})
+        schedule_catalog_invalidation(changed_plain)
+
+    for n, order in zip(accepted, orders):
+        results[n] = order
+    return results
@@ -0,0 +1,213 @@
+# store/outbox.py
+"""
+Outbox delivery.
+
+Events are claimed in batches with ``SELECT ... FOR UPDATE SKIP LOCKED`` so any
+number of relay replicas can run side by side without delivering an event
+twice. The claim is a lease: the short claiming transaction moves the batch's
+``next_attempt_at`` past the time its delivery may take and commits, so no
+row lock or transaction stays open while HTTP requests are in flight. A relay
+that dies mid-batch simply lets the lease run out and another one retries.
+Events are dispatched concurrently over one pooled HTTP session and marked
+in a second short transaction: one UPDATE for the delivered events and one
+bulk UPDATE for the failed ones.
+"""
+import logging
+import select
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from store.models import Outbox, OutboxArchive
+
+logger = logging.getLogger(__name__)
+
+# Channel notified by the store_outbox_notify trigger (migration 0010)
+OUTBOX_CHANNEL = "store_outbox"
+
+# Event type -> path on the invoice service. Events without a subscriber are
+# acknowledged as sent.
+EVENT_ENDPOINTS = {
+    "GENERATE_INVOICE": "/generate-invoice/",
+}
+
+
+def build_session(concurrency):
+    """A requests session whose connection pool matches the dispatch concurrency."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=len(EVENT_ENDPOINTS) or 1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class OutboxRelay:
+    def __init__(self, batch_size=100, concurrency=16, timeout=5, session=None):
+        self.batch_size = batch_size
+        self.timeout = timeout
+        # Worst case for one batch: every round of `concurrency` requests times out
+        self.lease = timedelta(seconds=timeout * -(-batch_size // concurrency) + 30)
+        self.base_url = getattr(settings, "INVOICE_SERVICE_URL", "http://invoice_service:8001").rstrip("/")
+        self.session = session or build_session(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="outbox")
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def deliver(self, event):
+        """Sends one event; returns None on success or the error message."""
+        path = EVENT_ENDPOINTS.get(event.event_type)
+        if path is None:
+            return None
+        try:
+            response = self.session.post(self.base_url + path, json=event.payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            return str(e)
+        if response.status_code >= 300:
+            return f"Service returned {response.status_code}"
+        return None
+
+    def claim(self):
+        """Leases one batch of due events to this relay and returns them."""
+        now = timezone.now()
+        with transaction.atomic():
+            events = list(
+                Outbox.objects.filter(
+                    status__in=Outbox.DELIVERABLE_STATUSES,
+                    next_attempt_at__lte=now,
+                )
+                .order_by("next_attempt_at")
+                .select_for_update(skip_locked=True)[:self.batch_size]
+            )
+            if events:
+                Outbox.objects.filter(pk__in=[event.pk for event in events]).update(
+                    next_attempt_at=now + self.lease
+                )
+        return events
+
+    def relay_batch(self):
+        """Claims, delivers and marks one batch. Returns the number of events handled."""
+        events = self.claim()
+        if not events:
+            return 0
+
+        # Outside any transaction: the lease keeps other relays off these rows
+        errors = list(self.executor.map(self.deliver, events))
+
+        now = timezone.now()
+        sent, failed = [], []
+        for event, error in zip(events, errors):
+            if error is None:
+                event.mark_sent(now)
+                sent.append(event.pk)
+            else:
+                event.mark_failed(error, now)
+                failed.append(event)
+                logger.error(f"Failed to relay {event.id} (attempt {event.attempts}): {error}")
+
+        with transaction.atomic():
+            # Delivered events all get the same values: one plain UPDATE
+            # instead of a per-row CASE, which grows with the batch
+            if sent:
+                Outbox.objects.filter(pk__in=sent).update(status="sent", processed_at=now, last_error="")
+            if failed:
+                Outbox.objects.bulk_update(
+                    failed,
+                    ["status", "processed_at", "attempts", "next_attempt_at", "last_error"],
+                    batch_size=len(failed),
+                )
+        return len(events)
+
+
+def retention_cutoff(days=None):
+    """Events created before this moment belong in the archive."""
+    if days is None:
+        days = getattr(settings, "OUTBOX_RETENTION_DAYS", 7)
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_events(cutoff, chunk_size=1000):
+    """
+    Moves one chunk of delivered/dead events created before ``cutoff`` into
+    OutboxArchive. Each chunk is its own short transaction, and rows another
+    worker holds are skipped. Returns the number of events moved.
+    """
+    with transaction.atomic():
+        rows = list(
+            Outbox.objects.filter(status__in=OutboxArchive.ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+            .order_by("id")
+            .select_for_update(skip_locked=True)
+            .values(*OutboxArchive.ARCHIVED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        OutboxArchive.objects.bulk_create([OutboxArchive(**row) for row in rows], ignore_conflicts=True)
+        Outbox.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+def purge_archive(cutoff, chunk_size=1000):
+    """Deletes one chunk of archived events created before ``cutoff``."""
+    ids = list(
+        OutboxArchive.objects.filter(created_at__lt=cutoff)
+        .order_by("id")
+        .values_list("id", flat=True)[:chunk_size]
+    )
+    if not ids:
+        return 0
+    return OutboxArchive.objects.filter(pk__in=ids).delete()[0]
+
+
+class OutboxListener:
+    """
+    Blocks until new Outbox rows are committed. On PostgreSQL this LISTENs on
+    a dedicated connection and wakes on NOTIFY, using ``timeout`` only as a
+    fallback poll; on other backends (SQLite in tests) it simply sleeps.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.wrapper = connections[using]
+        self.connection = None
+
+    @property
+    def enabled(self):
+        return self.wrapper.vendor == "postgresql"
+
+    def listen(self):
+        # A raw connection outside the ORM so LISTEN survives the relay's
+        # own transactions; it must be in autocommit to receive notifications.
+        self.connection = self.wrapper.get_new_connection(self.wrapper.get_connection_params())
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {OUTBOX_CHANNEL}")
+
+    def wait(self, timeout):
+        if not self.enabled:
+            time.sleep(timeout)
+            return
+
+        try:
+            if self.connection is None:
+                self.listen()
+            if select.select([self.connection], [], [], timeout)[0]:
+                self.connection.poll()
+                self.connection.notifies.clear()
+        except Exception as e:
+            logger.warning(f"Outbox LISTEN connection lost, polling instead: {e}")
+            self.close()
+            time.sleep(timeout)
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
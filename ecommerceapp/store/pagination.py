@@ -0,0 +1,64 @@
+# store/pagination.py
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination over the view's ordering: the OrderingFilter
+    choice when the view has one, otherwise ``view.ordering``. Each page is a
+    ``WHERE <field> < <cursor> ORDER BY ... LIMIT`` query, so latency does not
+    grow with the table or the page number.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        # Views may page by something request-specific, e.g. search relevance
+        if hasattr(view, "get_keyset_ordering"):
+            ordering = view.get_keyset_ordering(request, queryset)
+            if ordering:
+                return ordering
+
+        if any(hasattr(backend, "get_ordering") for backend in getattr(view, "filter_backends", [])):
+            return super().get_ordering(request, queryset, view)
+
+        ordering = getattr(view, "ordering", None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+class MergedQuerySet:
+    """
+    Several querysets paged as one by KeysetPagination, e.g. a table and its
+    archive. Supports what the paginator calls (``order_by``, ``filter`` and
+    a slice); a slice ``[start:stop]`` reads at most ``stop`` rows from each
+    part and merges them on the first ordering field, so every page is still
+    one keyset query per part.
+    """
+
+    def __init__(self, *querysets, ordering=()):
+        self.querysets = querysets
+        self.ordering = ordering
+
+    def order_by(self, *ordering):
+        return MergedQuerySet(*(queryset.order_by(*ordering) for queryset in self.querysets), ordering=ordering)
+
+    def filter(self, *args, **kwargs):
+        return MergedQuerySet(*(queryset.filter(*args, **kwargs) for queryset in self.querysets), ordering=self.ordering)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError("MergedQuerySet only supports slicing without a step.")
+        field = self.ordering[0]
+        rows = heapq.merge(
+            *(queryset[:index.stop] for queryset in self.querysets),
+            key=attrgetter(field.lstrip("-")),
+            reverse=field.startswith("-"),
+        )
+        return list(islice(rows, index.start, index.stop))
@@ -0,0 +1,139 @@
+# store/rollups.py
+"""
+Daily sales rollup maintenance.
+
+DailySales / DailyProductSales hold one row per day (and per product per day)
+so reports read a handful of rows instead of scanning every order. Days are
+rebuilt from the raw orders placed on them: incrementally, for the days
+touched by committed transactions, or in bulk through
+``manage.py backfill_daily_sales``.
+
+A commit that touches orders only records their days as PendingSalesDay
+markers (see ``schedule_sales_rollup``); ``manage.py refresh_sales_rollup``
+rebuilds the marked days on a schedule, so checkouts never pay for a day's
+aggregation. Rows are written with upserts, so a refresher and a backfill
+rebuilding the same day at once do not collide.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from store.models import DailyProductSales, DailySales, Order, OrderItem, PendingSalesDay
+
+DAILY_FIELDS = ["order_count", "completed_order_count", "revenue", "units_sold", "updated_at"]
+
+
+def _day_bounds(start, end):
+    """Aware datetimes covering ``start``..``end`` inclusive in the current time zone."""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def rebuild_range(start, end, using=DEFAULT_DB_ALIAS):
+    """
+    Recomputes the rollup rows for every day from ``start`` to ``end``
+    (inclusive) with two grouped queries and replaces them in one transaction.
+    """
+    lower, upper = _day_bounds(start, end)
+
+    day_rows = (
+        Order.objects.using(using)
+        .filter(date_order__gte=lower, date_order__lt=upper)
+        .annotate(day=TruncDate("date_order"))
+        .values("day")
+        .annotate(
+            order_count=Count("id"),
+            completed_order_count=Count("id", filter=Q(complete=True)),
+            revenue=Sum("total_due", filter=Q(complete=True)),
+        )
+        .order_by()
+    )
+    product_rows = (
+        OrderItem.objects.using(using)
+        .filter(order__date_order__gte=lower, order__date_order__lt=upper)
+        .annotate(day=TruncDate("order__date_order"))
+        .values("day", "product")
+        .annotate(units_sold=Sum("quantity"), revenue=Sum(F("price_at_purchase") * F("quantity")))
+        .order_by()
+    )
+
+    product_sales = [
+        DailyProductSales(
+            date=row["day"],
+            product_id=row["product"],
+            units_sold=row["units_sold"],
+            revenue=row["revenue"] or 0,
+        )
+        for row in product_rows
+    ]
+    units_by_day = {}
+    for row in product_sales:
+        units_by_day[row.date] = units_by_day.get(row.date, 0) + row.units_sold
+
+    daily_sales = [
+        DailySales(
+            date=row["day"],
+            order_count=row["order_count"],
+            completed_order_count=row["completed_order_count"],
+            revenue=row["revenue"] or 0,
+            units_sold=units_by_day.get(row["day"], 0),
+        )
+        for row in day_rows
+    ]
+
+    with transaction.atomic(using=using):
+        DailySales.objects.using(using).filter(date__gte=start, date__lte=end).delete()
+        DailyProductSales.objects.using(using).filter(date__gte=start, date__lte=end).delete()
+        # Upserts: a concurrent rebuild of the same day may have written it meanwhile
+        DailySales.objects.using(using).bulk_create(
+            daily_sales, update_conflicts=True, unique_fields=["date"], update_fields=DAILY_FIELDS
+        )
+        DailyProductSales.objects.using(using).bulk_create(
+            product_sales,
+            update_conflicts=True,
+            unique_fields=["date", "product"],
+            update_fields=["units_sold", "revenue"],
+        )
+    return len(daily_sales)
+
+
+def refresh_days(days, using=DEFAULT_DB_ALIAS):
+    """Rebuilds each of ``days``; consecutive days are rebuilt together."""
+    days = sorted(set(days))
+    while days:
+        start = end = days.pop(0)
+        while days and days[0] == end + timedelta(days=1):
+            end = days.pop(0)
+        rebuild_range(start, end, using=using)
+
+
+def mark_pending(days, using=DEFAULT_DB_ALIAS):
+    """Queues ``days`` for ``refresh_pending``; a day already queued is left as is."""
+    PendingSalesDay.objects.using(using).bulk_create(
+        [PendingSalesDay(date=day) for day in days], ignore_conflicts=True
+    )
+
+
+def refresh_pending(limit=31, using=DEFAULT_DB_ALIAS):
+    """
+    Rebuilds up to ``limit`` queued days and removes their markers in one
+    transaction; returns how many days were refreshed. A day marked again by
+    a commit racing the rebuild stays queued for the next pass.
+    """
+    with transaction.atomic(using=using):
+        days = list(
+            PendingSalesDay.objects.using(using)
+            .select_for_update(skip_locked=True)
+            .order_by("date")
+            .values_list("date", flat=True)[:limit]
+        )
+        if not days:
+            return 0
+        PendingSalesDay.objects.using(using).filter(date__in=days).delete()
+        refresh_days(days, using=using)
+    return len(days)
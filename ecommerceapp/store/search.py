@@ -0,0 +1,71 @@
+# store/search.py
+"""
+Product search backend.
+
+On PostgreSQL, ``?search=`` matches the trigger-maintained ``search_vector``
+(GIN indexed) with prefix terms for typeahead, ranked by ``ts_rank``. When
+the first page comes back empty and nothing matches at all, ``typo_fallback``
+retries with the ``%>`` word-similarity operator on the name, which the
+``store_product_name_trgm`` GIN index serves; the similarity is computed only
+to order those rows. Other databases (SQLite in tests) fall back to DRF's
+``icontains`` SearchFilter.
+"""
+import re
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from rest_framework import filters
+
+MAX_TERMS = 8
+TRIGRAM_THRESHOLD = 0.3
+
+
+def prefix_query(terms):
+    """``["red", "sho"]`` -> ``red:* & sho:*``, with everything but word characters dropped."""
+    words = [word for term in terms for word in re.findall(r"\w+", term)][:MAX_TERMS]
+    return " & ".join(f"{word}:*" for word in words)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or connections[queryset.db].vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        raw_query = prefix_query(terms)
+        if not raw_query:
+            return queryset.none()
+
+        query = SearchQuery(raw_query, search_type="raw", config="english")
+        # Kept for typo_fallback, which only runs if this finds nothing
+        request._product_search = (queryset, " ".join(terms))
+        # Ranks are cast to double precision so cursor positions round-trip exactly
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+
+    def typo_fallback(self, request, matches):
+        """
+        The trigram queryset to page instead of ``matches`` (the full-text
+        results) when those are empty, or None. Call it only once a page of
+        ``matches`` came back empty, so a normal search costs no extra query.
+        """
+        base, text = getattr(request, "_product_search", (None, None))
+        if base is None or matches.exists():
+            return None
+        with connections[base.db].cursor() as cursor:
+            # Threshold of the %> operator for this session (pg_trgm defaults to 0.6)
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(TRIGRAM_THRESHOLD)])
+        # The lookup is used directly: ``name__trigram_word_similar`` is only
+        # registered when django.contrib.postgres is an installed app
+        return (
+            base.filter(TrigramWordSimilar(F("name"), text))
+            .annotate(search_rank=Cast(TrigramWordSimilarity(text, "name"), FloatField()))
+        )
+
+    def is_ranked(self, request, queryset):
+        """True when filter_queryset annotates ``search_rank`` for this request."""
+        return bool(self.get_search_terms(request)) and connections[queryset.db].vendor == "postgresql"
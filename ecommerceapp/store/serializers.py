@@ -1,13 +1,52 @@
-from django.db import transaction
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from store.models import Customer, Product, Order, OrderItem, Outbox, Shipment, Payment
+from rest_framework.permissions import SAFE_METHODS
+from store.fields import BatchedPrimaryKeyRelatedField
+from store.models import Customer, Product, Order, OrderItem, Outbox, OutboxArchive, Shipment, Payment
+from store.orders import InsufficientStock, place_order
+
+
+# --- Sparse Fieldsets ---
+class SparseFieldsetMixin:
+    """
+    Lets read requests ask for a subset of fields with ``?fields=id,total_due``.
+    Only the top-level serializer is trimmed; nested serializers are untouched.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        wanted = requested_fields(request)
+        if wanted:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+def requested_fields(request):
+    """The set of field names in ``?fields=``, or None when not given."""
+    fields = request.query_params.get("fields")
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(",") if name.strip()}
+
+
+class OutOfStock(serializers.ValidationError):
+    """A 400 whose ``items`` list keeps InsufficientStock's per-product dicts as-is."""
+
+    def __init__(self, errors):
+        super().__init__()
+        # ValidationError would turn the counts into strings
+        self.detail = {"items": errors}
 
 
 # --- Customer Serializer ---
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Change from SlugRelatedField to PrimaryKeyRelatedField
-    user = serializers.PrimaryKeyRelatedField( 
+    user = BatchedPrimaryKeyRelatedField(
         queryset=User.objects.all(), 
         style={'base_template': 'input.html'} # Keeps it as a text box instead of a dropdown
     )
@@ -17,36 +56,70 @@ class CustomerSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "first_name", "last_name", "email", "phone_number"]
 
 # --- Product Serializer ---
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["search_vector"]
+        # Sharding is changed with store/inventory.py's shard_stock
+        read_only_fields = ["stock_shards"]
+
+    def validate_stock_quantity(self, value):
+        # A sharded product's stock lives in its shards; this is only a display total
+        if self.instance is not None and self.instance.stock_shards and value != self.instance.stock_quantity:
+            raise serializers.ValidationError("Stock of a sharded product is changed with restock, not here.")
+        return value
 
 
 # --- Payment Serializer ---
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    serializer_related_field = BatchedPrimaryKeyRelatedField
+
     class Meta:
         model = Payment
         fields = "__all__"
 
+    def save(self, **kwargs):
+        # Paying an expired order takes its stock again; if that fails the
+        # payment is not kept either
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except InsufficientStock as exc:
+            raise OutOfStock(exc.errors)
+
 
 # --- Shipment Serializer ---
-class ShipmentSerializer(serializers.ModelSerializer):
+class ShipmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    serializer_related_field = BatchedPrimaryKeyRelatedField
+
     class Meta:
         model = Shipment
         fields = "__all__"
 
 
 # --- Outbox Serializer ---
-class OutboxSerializer(serializers.ModelSerializer):
+class OutboxSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Outbox
         fields = "__all__"
 
 
+# --- Outbox Archive Serializer ---
+class OutboxArchiveSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OutboxArchive
+        fields = "__all__"
+
+
+# --- Outbox History Serializer (hot and archived events in one list) ---
+class OutboxHistorySerializer(OutboxArchiveSerializer):
+    class Meta(OutboxArchiveSerializer.Meta):
+        fields = OutboxArchive.ARCHIVED_FIELDS
+
+
 # --- Order Item Serializer ---
-class OrderItemSerializer(serializers.ModelSerializer):
-    product_id = serializers.PrimaryKeyRelatedField(
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    product_id = BatchedPrimaryKeyRelatedField(
         queryset=Product.objects.all(), source="product"
     )
     product = serializers.StringRelatedField(read_only=True)
@@ -58,73 +131,32 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 
 # --- Order Serializer ---
-class OrderSerializer(serializers.HyperlinkedModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.HyperlinkedModelSerializer):
     # Make customer writable, not read-only
-    customer = serializers.PrimaryKeyRelatedField(queryset=Customer.objects.all())
+    customer = BatchedPrimaryKeyRelatedField(queryset=Customer.objects.all())
     items = OrderItemSerializer(many=True)
 
     class Meta:
         model = Order
         fields = ["url", "id", "customer", "items", "total_due", "transaction_id", "complete"]
 
-    # --- STOCK CHECK VALIDATION ---
+    # Stock is checked by place_order's conditional UPDATE, not here: a read at
+    # validation time would cost a query per item and could be stale anyway.
     def validate(self, data):
         items_data = data.get("items")
         if not items_data:
             raise serializers.ValidationError({"items": "Order must contain at least one item."})
-
-        for item in items_data:
-            product = item["product"]
-            requested_quantity = item["quantity"]
-
-            if product.stock_quantity < requested_quantity:
-                raise serializers.ValidationError({
-                    "items": f"Not enough stock for {product.name}. "
-                             f"Requested: {requested_quantity}, Available: {product.stock_quantity}"
-                })
         return data
 
     def create(self, validated_data):
         items_data = validated_data.pop("items")
+        lines = [(item["product"].pk, item["quantity"]) for item in items_data]
 
-        with transaction.atomic():
-            # 1. Create the Order
-            order = Order.objects.create(**validated_data)
-
-            total_due = 0
-
-            # 2. Process items and decrement stock
-            for item_data in items_data:
-                product = Product.objects.select_for_update().get(pk=item_data["product"].pk)
-                quantity = item_data["quantity"]
-
-                # Create the line item
-                line_item = OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price_at_purchase=product.current_price,
-                )
-
-                # Update the inventory safely
-                product.stock_quantity -= quantity
-                product.save()
-
-                # Update total due
-                total_due += line_item.quantity * line_item.price_at_purchase
-
-            # 3. Update order total
-            order.total_due = total_due
-            order.save()
-
-            # 4. Log the Outbox Event
-            Outbox.objects.create(
-                event_type="ORDER_PLACED",
-                payload={
-                    "order_id": order.id,
-                    "total_due": str(order.total_due),
-                    "customer_email": order.customer.email if order.customer else None,
-                },
-            )
+        try:
+            order = place_order(lines, **validated_data)
+        except InsufficientStock as exc:
+            raise OutOfStock(exc.errors)
 
+        # One query for the response instead of one per line item
+        prefetch_related_objects([order], Prefetch("items", queryset=OrderItem.objects.select_related("product")))
         return order
@@ -0,0 +1,126 @@
+# store/services.py
+"""
+Client for the internal microservices (employee, invoice).
+
+Every service gets one pooled ``requests`` session, a circuit breaker and a
+short-TTL response cache, so an offline dependency fails fast instead of
+costing a full timeout on every admin page. ``submit`` starts a call in the
+background so a page can run it alongside its database queries.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+
+class ServiceUnavailable(Exception):
+    """The service failed, timed out or returned an error status."""
+
+
+class CircuitOpen(ServiceUnavailable):
+    """The service failed repeatedly and is not being called for now."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures; after
+    ``reset_after`` seconds a single trial call is let through (half-open).
+    """
+
+    def __init__(self, failure_threshold=3, reset_after=30):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half-open: let this caller probe, keep the others out
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ServiceClient:
+    def __init__(self, name, base_url, timeout=(0.5, 2), cache_ttl=10, pool_size=10):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.breaker = CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, path, **kwargs):
+        """Performs a call through the circuit breaker; returns the response."""
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.name} service circuit is open")
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = self.session.request(method, self.base_url + path, **kwargs)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise ServiceUnavailable(f"{self.name} service unreachable: {e}") from e
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise ServiceUnavailable(f"{self.name} service returned {response.status_code}")
+        self.breaker.record_success()
+        return response
+
+    def get_json(self, path, params=None, cache_ttl=None):
+        """GET ``path`` and return the decoded JSON, cached for ``cache_ttl`` seconds."""
+        ttl = self.cache_ttl if cache_ttl is None else cache_ttl
+        cache_key = f"svc:{self.name}:{path}:{sorted((params or {}).items())}"
+        if ttl:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        response = self.request("GET", path, params=params)
+        if response.status_code != 200:
+            raise ServiceUnavailable(f"{self.name} service returned {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise ServiceUnavailable(f"{self.name} service returned invalid JSON") from e
+
+        if ttl:
+            cache.set(cache_key, data, timeout=ttl)
+        return data
+
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="services")
+
+
+def submit(fn, *args, **kwargs):
+    """Starts a call in the background; returns a Future."""
+    return _executor.submit(fn, *args, **kwargs)
+
+
+employee_service = ServiceClient(
+    "employee", getattr(settings, "EMPLOYEE_SERVICE_URL", "http://employee_service:3000")
+)
+invoice_service = ServiceClient(
+    "invoice", getattr(settings, "INVOICE_SERVICE_URL", "http://invoice_service:8001")
+)
@@ -1,6 +1,19 @@
-from rest_framework import viewsets, filters
+from datetime import datetime, time
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
-from store.models import Customer, Product, Order, OrderItem, Payment, Shipment, Outbox
+from store.models import Customer, Product, Order, OrderItem, Payment, Shipment, Outbox, OutboxArchive
+from store.catalog import cached_response
+from store.idempotency import streams_body
+from store.imports import ON_ERROR_CHOICES, import_orders
+from store.outbox import retention_cutoff
+from store.fast_serializers import ORDER_COLUMNS, serialize_orders
+from store.pagination import KeysetPagination, MergedQuerySet
+from store.search import ProductSearchFilter
 from store.serializers import (
     CustomerSerializer,
     ProductSerializer,
@@ -9,6 +22,9 @@ from store.serializers import (
     PaymentSerializer,
     ShipmentSerializer,
     OutboxSerializer,
+    OutboxArchiveSerializer,
+    OutboxHistorySerializer,
+    requested_fields,
 )
 
 
@@ -16,6 +32,8 @@ from store.serializers import (
 class CustomerViewSet(viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    pagination_class = KeysetPagination
+    ordering = ["id"]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ["first_name", "last_name", "email", "phone_number"]
     filterset_fields = ["email"]
@@ -25,27 +43,102 @@ class CustomerViewSet(viewsets.ModelViewSet):
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [ProductSearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ["name", "description"]
     filterset_fields = ["stock_quantity"]
     ordering_fields = ["current_price", "stock_quantity"]
     ordering = ["name"]
 
+    def get_keyset_ordering(self, request, queryset):
+        # Ranked search results page by relevance unless ?ordering= is given
+        if "ordering" not in request.query_params and ProductSearchFilter().is_ranked(request, queryset):
+            return ("-search_rank",)
+        return None
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page == []:
+            fallback = ProductSearchFilter().typo_fallback(self.request, queryset)
+            if fallback is not None:
+                page = super().paginate_queryset(fallback)
+        return page
+
+    # Reads are served through the catalog cache (see store/catalog.py)
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(ProductViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs["pk"]
+        return cached_response(
+            request,
+            lambda: super(ProductViewSet, self).retrieve(request, *args, **kwargs),
+            product_id=int(pk) if pk.isdigit() else pk,
+        )
+
 
 # 3. Order ViewSet (Deep Prefetch + Ordering)
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all().select_related("customer").prefetch_related("items__product")
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["complete", "transaction_id"]
     ordering_fields = ["date_order", "total_due"]
     ordering = ["-date_order"]
 
+    # Reads bypass OrderSerializer: same JSON, built from .values() rows
+    # (see store/fast_serializers.py); ?fields= without items skips the item
+    # query there. Writes still go through the serializer.
+    def _order_rows(self):
+        queryset = self.filter_queryset(Order.objects.all())
+        return queryset.values(*ORDER_COLUMNS)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self._order_rows())
+        data = serialize_orders(page, request, requested_fields(request))
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(self._order_rows(), pk=kwargs[self.lookup_field])
+        return Response(serialize_orders([row], request, requested_fields(request))[0])
+
+    @streams_body
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """
+        JSON-lines bulk import, see store/imports.py.
+        ``?chunk_size=`` sets the batch size, ``?on_error=abort`` makes it all-or-nothing.
+        """
+        on_error = request.query_params.get("on_error", "skip")
+        if on_error not in ON_ERROR_CHOICES:
+            return Response({"on_error": f"Must be one of {', '.join(ON_ERROR_CHOICES)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            chunk_size = int(request.query_params.get("chunk_size", 0)) or None
+        except ValueError:
+            return Response({"chunk_size": "Must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read straight from the stream; request.data would parse the whole body as one document
+        results, committed = import_orders(
+            request.stream or [],
+            self.get_serializer_class(),
+            context=self.get_serializer_context(),
+            chunk_size=chunk_size,
+            on_error=on_error,
+        )
+        created = sum(result["status"] == "created" for result in results)
+        return Response(
+            {"created": created, "failed": len(results) - created, "committed": committed, "results": results},
+            status=status.HTTP_200_OK if committed else status.HTTP_400_BAD_REQUEST,
+        )
+
 
 # 4. OrderItem ViewSet
 class OrderItemViewSet(viewsets.ModelViewSet):
     queryset = OrderItem.objects.all().select_related("order", "product")
     serializer_class = OrderItemSerializer
+    pagination_class = KeysetPagination
+    ordering = ["id"]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["order", "product"]
 
@@ -54,6 +147,7 @@ class OrderItemViewSet(viewsets.ModelViewSet):
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all().select_related("order")
     serializer_class = PaymentSerializer
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["status", "method"]
     ordering_fields = ["amount", "created_at"]
@@ -64,18 +158,89 @@ class PaymentViewSet(viewsets.ModelViewSet):
 class ShipmentViewSet(viewsets.ModelViewSet):
     queryset = Shipment.objects.all().select_related("order")
     serializer_class = ShipmentSerializer
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["status"]
     ordering_fields = ["shipped_at"]
-    ordering = ["-shipped_at"]
+    # shipped_at is nullable, which a cursor cannot page over
+    ordering = ["-id"]
 
 
 # 7. Outbox ViewSet (Audit-only, ReadOnly)
 class OutboxViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Sent/dead events older than OUTBOX_RETENTION_DAYS live in OutboxArchive.
+    ``?archived=true`` reads only the archive and ``?archived=false`` only
+    the hot table. A listing with a ``created_at`` bound older than the
+    retention cutoff reads both, merged under one cursor: pending/failed
+    events are never archived, and the range may straddle the cutoff.
+    """
     queryset = Outbox.objects.all().order_by("-created_at")
     serializer_class = OutboxSerializer
+    pagination_class = KeysetPagination
+    ordering = ["-created_at"]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ["status", "event_type"]
+    filterset_fields = {
+        "status": ["exact"],
+        "event_type": ["exact"],
+        "created_at": ["gte", "lt"],
+    }
+    _tables = None
+
+    def _parse_bound(self, value):
+        if not value:
+            return None
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day, time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def _resolve_tables(self):
+        params = self.request.query_params
+        flag = params.get("archived")
+        if flag is not None:
+            return "archive" if flag.lower() in ("1", "true", "yes") else "hot"
+        if self.action != "list":
+            return "hot"
+        try:
+            bounds = [self._parse_bound(params.get(name)) for name in ("created_at__lt", "created_at__gte")]
+        except ValueError:
+            return "hot"
+        cutoff = retention_cutoff()
+        if any(bound is not None and bound <= cutoff for bound in bounds):
+            return "both"
+        return "hot"
+
+    def get_tables(self):
+        """``"hot"``, ``"archive"`` or ``"both"``; worked out once per request."""
+        if self._tables is None:
+            self._tables = self._resolve_tables()
+        return self._tables
+
+    def get_queryset(self):
+        if self.get_tables() == "archive":
+            return OutboxArchive.objects.all().order_by("-created_at")
+        return super().get_queryset()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_tables() == "both":
+            archive = super().filter_queryset(OutboxArchive.objects.all())
+            return MergedQuerySet(queryset, archive)
+        return queryset
+
+    def get_serializer_class(self):
+        tables = self.get_tables()
+        if tables == "archive":
+            return OutboxArchiveSerializer
+        if tables == "both":
+            return OutboxHistorySerializer
+        return super().get_serializer_class()
 
 # views.py
 from django.http import JsonResponse
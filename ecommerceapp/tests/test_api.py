@@ -0,0 +1,82 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+from store.models import Customer, Order, OrderItem, Product
+
+
+class OrderListApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        product = Product.objects.create(name="Widget", stock_quantity=100, current_price=2)
+        for _ in range(7):
+            order = Order.objects.create(customer=customer, total_due=2)
+            OrderItem.objects.bulk_create([OrderItem(order=order, product=product, quantity=1, price_at_purchase=2)])
+
+    def test_cursor_pagination_walks_every_order_once(self):
+        seen = []
+        url = "/api/v1/orders/?page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            seen += [order["id"] for order in page["results"]]
+            url = page["next"]
+        self.assertEqual(sorted(seen), sorted(Order.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), 7)
+
+    def test_sparse_fieldset_skips_items(self):
+        with self.assertNumQueries(1):
+            page = self.client.get("/api/v1/orders/", {"fields": "id,total_due"}).json()
+        self.assertEqual(set(page["results"][0]), {"id", "total_due"})
+
+    def test_fast_read_path_matches_order_serializer(self):
+        from rest_framework.test import APIRequestFactory
+        from store.serializers import OrderSerializer
+
+        request = APIRequestFactory().get("/api/v1/orders/")
+        request.query_params = request.GET
+        expected = OrderSerializer(Order.objects.order_by("-date_order", "-id"), many=True, context={"request": request}).data
+
+        listed = self.client.get("/api/v1/orders/").json()["results"]
+        self.assertEqual(sorted(listed, key=lambda o: o["id"]), sorted(expected, key=lambda o: o["id"]))
+
+        detail = self.client.get(f"/api/v1/orders/{listed[0]['id']}/").json()
+        self.assertEqual(detail, listed[0])
+
+
+class ProductSearchApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Product.objects.create(name="Red Shoe", description="Leather", stock_quantity=1, current_price=50)
+        Product.objects.create(name="Blue Hat", description="Wool", stock_quantity=1, current_price=20)
+
+    def test_search_matches_name_and_description(self):
+        names = [p["name"] for p in self.client.get("/api/v1/products/", {"search": "shoe"}).json()["results"]]
+        self.assertEqual(names, ["Red Shoe"])
+        names = [p["name"] for p in self.client.get("/api/v1/products/", {"search": "wool"}).json()["results"]]
+        self.assertEqual(names, ["Blue Hat"])
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "full-text and trigram search need PostgreSQL")
+    def test_typo_falls_back_to_trigram_search(self):
+        response = self.client.get("/api/v1/products/", {"search": "shoez"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["name"] for p in response.json()["results"]], ["Red Shoe"])
+
+    def test_search_vector_is_not_serialized(self):
+        product = self.client.get("/api/v1/products/").json()["results"][0]
+        self.assertNotIn("search_vector", product)
+
+
+class OrderCreateApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Widget", stock_quantity=2, current_price=2)
+
+    def test_out_of_stock_error_is_structured(self):
+        data = {"customer": self.customer.id, "items": [{"product_id": self.product.id, "quantity": 3}]}
+        response = self.client.post("/api/v1/orders/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+        error = response.json()["items"][0]
+        self.assertEqual((error["product_id"], error["requested"], error["available"]), (self.product.id, 3, 2))
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from store import catalog
+from store.models import Customer, Product
+from store.orders import place_order
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(name="Widget", stock_quantity=10, current_price=2)
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.client.get("/api/v1/products/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/v1/products/")
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(catalog.stats(), {"hits": 1, "misses": 1, "coalesced": 0})
+
+    def test_product_save_invalidates(self):
+        url = f"/api/v1/products/{self.product.pk}/"
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.current_price = 3
+            self.product.save()
+        self.assertEqual(self.client.get(url).json()["current_price"], "3.00")
+
+    def test_order_placement_invalidates_stock(self):
+        url = f"/api/v1/products/{self.product.pk}/"
+        self.client.get(url)
+        customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order([(self.product.pk, 4)], customer=customer)
+        self.assertEqual(self.client.get(url).json()["stock_quantity"], 6)
+
+    def test_order_only_invalidates_the_products_it_sold(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Product.objects.create(name="Gadget", stock_quantity=10, current_price=2)
+        customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        other_url = f"/api/v1/products/{other.pk}/"
+        self.client.get(other_url)
+        self.client.get("/api/v1/products/")
+        self.client.get("/api/v1/products/?search=Gadget")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order([(self.product.pk, 4)], customer=customer)
+
+        self.assertEqual(self.client.get(other_url)["X-Cache"], "HIT")
+        self.assertEqual(self.client.get("/api/v1/products/?search=Gadget")["X-Cache"], "HIT")
+        # The page holding the sold product is rendered again
+        listing = self.client.get("/api/v1/products/")
+        self.assertEqual(listing["X-Cache"], "MISS")
+        stock = {row["name"]: row["stock_quantity"] for row in listing.json()["results"]}
+        self.assertEqual(stock, {"Gadget": 10, "Widget": 6})
@@ -1,9 +1,13 @@
 import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
 from django.test import TransactionTestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from store.models import Product, Customer
+from store.inventory import available, shard_stock
+from store.models import Product, Customer, Order
 
 class TestConcurrencyAndIdempotencyTest(TransactionTestCase):
     def setUp(self):
@@ -21,6 +25,7 @@ class TestConcurrencyAndIdempotencyTest(TransactionTestCase):
     def test_idempotency_blocks_duplicates(self):
         """Verify that the same Idempotency-Key returns the cached response."""
         order_data = {
+            "customer": self.customer.id,
             "transaction_id": "unique-tx-123",
             "items": [{"product_id": self.product.id, "quantity": 1}]
         }
@@ -33,12 +38,15 @@ class TestConcurrencyAndIdempotencyTest(TransactionTestCase):
         # Second request (Immediate duplicate)
         resp2 = self.client.post(self.url, order_data, format='json', **headers)
         
-        # Should return 200 (cached) instead of creating a new order or failing
-        self.assertEqual(resp2.status_code, status.HTTP_200_OK)
+        # Should replay the original response byte for byte instead of creating a new order or failing
+        self.assertEqual(resp2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp2.content, resp1.content)
+        self.assertEqual(resp2["Content-Type"], resp1["Content-Type"])
         # Verify only one order was actually created in DB
         from store.models import Order
         self.assertEqual(Order.objects.count(), 1)
 
+    @unittest.skipUnless(connection.vendor == "postgresql", "SQLite cannot run concurrent write transactions")
     def test_race_condition_prevented(self):
         """Simulate two users buying the last item at the exact same time."""
         
@@ -46,6 +54,7 @@ class TestConcurrencyAndIdempotencyTest(TransactionTestCase):
             # Use a fresh client for each thread
             client = APIClient()
             data = {
+                "customer": self.customer.id,
                 "transaction_id": f"tx-{threading.get_ident()}",
                 "items": [{"product_id": self.product.id, "quantity": 1}]
             }
@@ -73,4 +82,48 @@ class TestConcurrencyAndIdempotencyTest(TransactionTestCase):
         
         # Final safety check: stock should NOT be negative
         self.product.refresh_from_db()
-        self.assertEqual(self.product.stock_quantity, 0)
\ No newline at end of file
+        self.assertEqual(self.product.stock_quantity, 0)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs real row locks (PostgreSQL)")
+class HotSkuLoadTest(TransactionTestCase):
+    """
+    60 concurrent buyers hitting one product with 40 units in stock, once with
+    plain row-locked stock and once with the stock spread over 16 shards.
+    Checkouts/second are measured by ``manage.py bench_hot_sku``.
+    """
+    BUYERS = 60
+    STOCK = 40
+
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Load", last_name="Test", email="load@example.com")
+        self.product = Product.objects.create(name="Flash Sale Item", stock_quantity=self.STOCK, current_price=10)
+        self.url = reverse('order-list')
+
+    def buy(self, n):
+        try:
+            data = {"customer": self.customer.id, "items": [{"product_id": self.product.id, "quantity": 1}]}
+            return APIClient().post(self.url, data, format='json').status_code
+        finally:
+            connection.close()
+
+    def run_buyers(self):
+        with ThreadPoolExecutor(max_workers=self.BUYERS) as pool:
+            return list(pool.map(self.buy, range(self.BUYERS)))
+
+    def assert_sold_out(self, statuses):
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), self.STOCK)
+        self.assertEqual(statuses.count(status.HTTP_400_BAD_REQUEST), self.BUYERS - self.STOCK)
+        self.assertEqual(Order.objects.count(), self.STOCK)
+
+    def test_row_locked_stock(self):
+        statuses = self.run_buyers()
+        self.assert_sold_out(statuses)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+    def test_sharded_stock(self):
+        shard_stock(self.product.id, 16)
+        statuses = self.run_buyers()
+        self.assert_sold_out(statuses)
+        self.assertEqual(available(self.product.id), 0)
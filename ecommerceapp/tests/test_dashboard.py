@@ -0,0 +1,85 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from store import dashboard
+from store.models import Customer, DailyProductSales, DailySales, Order, OrderItem, PendingSalesDay, Product
+from store.rollups import refresh_pending
+
+
+@mock.patch("store.dashboard._employee_count", return_value=3)
+class DashboardKpiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order = Order.objects.create(customer=customer, complete=True, total_due=10)
+        refresh_pending()
+
+    def test_snapshot_is_served_from_cache(self, _):
+        self.assertEqual(dashboard.get_kpis()["total_revenue"], 10)
+        with self.assertNumQueries(0):
+            kpis = dashboard.get_kpis()
+        self.assertEqual(kpis["customer_count"], 1)
+        self.assertEqual(kpis["employee_count"], 3)
+
+    def test_stale_snapshot_is_recomputed(self, _):
+        dashboard.get_kpis()
+        self.order.total_due = 25
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.save()
+        refresh_pending()
+        with self.settings(DASHBOARD_MAX_STALENESS=-1):
+            self.assertEqual(dashboard.get_kpis()["total_revenue"], 25)
+
+
+class DailySalesRollupTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Widget", stock_quantity=100, current_price=5)
+
+    def _order(self, days_ago, complete=True, quantity=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(customer=self.customer, complete=complete)
+            OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+        Order.objects.filter(pk=order.pk).update(date_order=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_commit_queues_the_day_for_the_refresher(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(customer=self.customer, complete=True)
+            OrderItem.objects.create(order=order, product=self.product, quantity=3)
+
+        # The commit itself only records the day
+        self.assertFalse(DailySales.objects.exists())
+        self.assertEqual(list(PendingSalesDay.objects.values_list("date", flat=True)), [timezone.localdate()])
+
+        call_command("refresh_sales_rollup", "--once", stdout=StringIO())
+        today = DailySales.objects.get(date=timezone.localdate())
+        self.assertEqual((today.order_count, today.revenue, today.units_sold), (1, 15, 3))
+        self.assertFalse(PendingSalesDay.objects.exists())
+
+    def test_rebuild_overwrites_existing_rows(self):
+        self._order(0, quantity=2)
+        refresh_pending()
+        DailySales.objects.update(order_count=99)
+        self._order(0)
+        self.assertEqual(refresh_pending(), 1)
+        self.assertEqual(DailySales.objects.get().order_count, 2)
+        self.assertEqual(DailyProductSales.objects.get().units_sold, 3)
+
+    def test_backfill_and_window_queries(self):
+        self._order(0, quantity=2)
+        self._order(1, complete=False)
+        self._order(400)
+        call_command("backfill_daily_sales", stdout=StringIO())
+
+        self.assertEqual(DailySales.objects.count(), 3)
+        today = timezone.localdate()
+        week = DailySales.objects.totals(today - timedelta(days=6), today)
+        self.assertEqual(week["revenue"], 10)
+        self.assertEqual(week["order_count"], 2)
+        self.assertEqual(list(DailyProductSales.objects.top_products()), [{"product__name": "Widget", "total_sold": 4}])
@@ -0,0 +1,89 @@
+import csv
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from store import exports
+from store.exports import claim_export_job, invoice_payloads, order_rows, queue_export_job, run_export_job, stream_csv
+from store.models import Customer, Order, OrderItem, Product
+
+
+class OrderExportTest(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name="Ada", last_name="Lovelace", email="ada@example.com")
+        product = Product.objects.create(name="Widget", stock_quantity=100, current_price=2)
+        for _ in range(5):
+            order = Order.objects.create(customer=customer, total_due=4)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price_at_purchase=2),
+                OrderItem(order=order, product=product, quantity=1, price_at_purchase=2),
+            ])
+
+    def _export(self, **kwargs):
+        return list(csv.reader("".join(stream_csv(order_rows(Order.objects.order_by("pk"), **kwargs))).splitlines()))
+
+    def test_orders_export_joins_customer(self):
+        with self.assertNumQueries(1):
+            rows = self._export()
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][1], "Ada Lovelace")
+
+    def test_line_item_expansion(self):
+        with self.assertNumQueries(2):
+            rows = self._export(with_items=True)
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[1][5:], ["Widget", "1", "2.00", "2.00"])
+
+    def test_invoice_payloads_for_many_orders(self):
+        with self.assertNumQueries(2):
+            payloads = list(invoice_payloads(Order.objects.order_by("pk")))
+        self.assertEqual(len(payloads), 5)
+        self.assertEqual(payloads[0]["customer_name"], "Ada Lovelace")
+        self.assertEqual(payloads[0]["items"], [{"name": "Widget", "price": 2.0, "quantity": 1}] * 2)
+
+
+class ExportJobTest(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        customer = Customer.objects.create(first_name="Ada", last_name="Lovelace", email="ada@example.com")
+        self.orders = Order.objects.bulk_create([Order(customer=customer, total_due=4) for _ in range(5)])
+
+    def test_queued_job_is_written_by_the_worker(self):
+        job = queue_export_job(Order.objects.filter(pk__in=[o.pk for o in self.orders[:3]]))
+        claimed = claim_export_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertIsNone(claim_export_job())
+
+        self.assertTrue(run_export_job(claimed, chunk_size=2))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.row_count), ("done", 3))
+        with open(job.path, newline="") as handle:
+            self.assertEqual(len(list(csv.reader(handle))), 4)
+
+    def test_failed_job_is_recorded_and_leaves_no_partial_file(self):
+        job = queue_export_job(Order.objects.all())
+
+        def failing_rows(*args, **kwargs):
+            yield exports.ORDER_HEADER
+            raise RuntimeError("connection lost")
+
+        with mock.patch.object(exports, "order_rows", failing_rows):
+            self.assertFalse(run_export_job(claim_export_job()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("failed", "connection lost"))
+        self.assertEqual(os.listdir(os.path.dirname(job.path)), [])
+
+    def test_job_abandoned_by_its_worker_is_claimed_again(self):
+        job = queue_export_job(Order.objects.all())
+        claim_export_job()
+        self.assertIsNone(claim_export_job())
+        later = timezone.now() + timedelta(seconds=exports.job_timeout() + 1)
+        self.assertEqual(claim_export_job(now=later).pk, job.pk)
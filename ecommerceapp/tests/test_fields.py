@@ -0,0 +1,24 @@
+from django.test import TestCase
+from store.models import Customer, Product
+from store.serializers import OrderSerializer
+
+
+class BatchedRelatedFieldTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.products = [Product.objects.create(name=f"Item {i}", current_price=1) for i in range(30)]
+
+    def payload(self, product_ids):
+        return {"customer": self.customer.pk, "items": [{"product_id": pk, "quantity": 1} for pk in product_ids]}
+
+    def test_large_cart_validates_with_one_query_per_model(self):
+        serializer = OrderSerializer(data=self.payload([p.pk for p in self.products]))
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual([item["product"] for item in serializer.validated_data["items"]], self.products)
+
+    def test_unknown_and_string_pks(self):
+        serializer = OrderSerializer(data=self.payload([str(self.products[0].pk), 999999]))
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors["items"][0], {})
+        self.assertEqual(serializer.errors["items"][1]["product_id"][0].code, "does_not_exist")
@@ -0,0 +1,59 @@
+import json
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from store.models import Customer, IdempotencyRecord, Order, Product
+
+
+class IdempotencyStoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Widget", stock_quantity=10, current_price=2)
+
+    def post(self, quantity=1, key="key-1"):
+        data = {"customer": self.customer.pk, "items": [{"product_id": self.product.pk, "quantity": quantity}]}
+        return self.client.post("/api/v1/orders/", data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_key_reuse_with_different_payload_is_rejected(self):
+        self.assertEqual(self.post(1).status_code, 201)
+        self.assertEqual(self.post(2).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_database_fallback_when_cache_is_down(self):
+        with mock.patch("store.idempotency.cache.add", return_value=None):
+            first = self.post()
+            second = self.post()
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(IdempotencyRecord.objects.get().status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_MAX_BODY_BYTES=10)
+    def test_oversized_response_is_not_replayed(self):
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_healthy_cache_does_not_query_the_fallback_table(self):
+        self.assertEqual(self.post().status_code, 201)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post().status_code, 201)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_streamed_import_is_not_read_into_memory(self):
+        record = json.dumps({"customer": self.customer.pk, "items": [{"product_id": self.product.pk, "quantity": 1}]})
+        body = "\n".join([record] * 3)
+        self.assertGreater(len(body), 100)
+
+        def post():
+            return self.client.post(
+                "/api/v1/orders/import/", body, content_type="application/x-ndjson", HTTP_IDEMPOTENCY_KEY="import-1"
+            )
+
+        first, second = post(), post()
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 3)
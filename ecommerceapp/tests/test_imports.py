@@ -0,0 +1,53 @@
+import json
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from store.models import Customer, DailySales, Order, Outbox, Product
+from store.rollups import refresh_pending
+
+
+class OrderImportApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Widget", stock_quantity=5, current_price=2)
+
+    def post(self, records, **params):
+        body = "\n".join(r if isinstance(r, str) else json.dumps(r) for r in records)
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return self.client.post(f"/api/v1/orders/import/?{query}", body, content_type="application/x-ndjson")
+
+    def order(self, quantity, product=None):
+        return {"customer": self.customer.pk, "items": [{"product_id": product or self.product.pk, "quantity": quantity}]}
+
+    def test_valid_records_are_created_and_failures_reported(self):
+        records = [self.order(2), "{not json", self.order(1, product=999999), self.order(3), self.order(1)]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(records, chunk_size=2)
+
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in body["results"]], ["created", "error", "error", "created", "error"])
+        self.assertEqual(body["results"][4]["errors"]["items"][0]["available"], 0)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(Outbox.objects.filter(event_type="ORDER_PLACED").count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+        # bulk_create skips signals; the day is queued explicitly
+        refresh_pending()
+        self.assertEqual(DailySales.objects.get().order_count, 2)
+
+    def test_chunk_query_count_is_independent_of_its_size(self):
+        counts = []
+        for size in (1, 5):
+            with CaptureQueriesContext(connection) as ctx:
+                self.post([self.order(1)] * size, chunk_size=5)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_abort_rolls_everything_back(self):
+        response = self.post([self.order(1), self.order(10)], on_error="abort")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["status"] for r in response.json()["results"]], ["rolled_back", "error"])
+        self.assertFalse(Order.objects.exists())
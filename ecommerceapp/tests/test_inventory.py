@@ -0,0 +1,135 @@
+import threading
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from store import inventory
+from store.inventory import available, reconcile_totals, release_expired, restock, shard_stock
+from store.models import Customer, Order, Payment, Product, StockReservation
+from store.orders import InsufficientStock, place_order
+
+
+class ShardedStockTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Hot", stock_quantity=10, current_price=5)
+        shard_stock(self.product.id, 4)
+
+    def test_stock_is_split_across_shards(self):
+        self.assertEqual(
+            list(self.product.shards.order_by("shard").values_list("quantity", flat=True)), [3, 3, 2, 2]
+        )
+        restock(self.product.id, 2)
+        self.assertEqual(available(self.product.id), 12)
+
+    def test_order_larger_than_any_shard_drains_several(self):
+        place_order([(self.product.id, 7)], customer=self.customer)
+        self.assertEqual(available(self.product.id), 3)
+        reservations = StockReservation.objects.filter(product=self.product)
+        self.assertEqual(sum(r.quantity for r in reservations), 7)
+        self.assertTrue(all(r.shard is not None for r in reservations))
+
+    def test_oversell_is_rejected(self):
+        with self.assertRaises(InsufficientStock) as ctx:
+            place_order([(self.product.id, 11)], customer=self.customer)
+        self.assertEqual(ctx.exception.errors[0]["available"], 10)
+        self.assertEqual(available(self.product.id), 10)
+
+    def test_sharded_stock_total_is_read_only_in_the_api(self):
+        url = f"/api/v1/products/{self.product.id}/"
+        response = APIClient().patch(url, {"stock_quantity": 50, "stock_shards": 0}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("stock_quantity", response.data)
+
+        response = APIClient().patch(url, {"current_price": "6.00", "stock_shards": 0}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_shards, 4)
+
+    def test_reconcile_updates_display_total(self):
+        place_order([(self.product.id, 4)], customer=self.customer)
+        reconcile_totals()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 6)
+
+
+class ReservationTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Plain", stock_quantity=5, current_price=5)
+        self.order = place_order([(self.product.id, 2)], customer=self.customer)
+        self.later = timezone.now() + timedelta(days=1)
+
+    def test_expired_unpaid_reservation_returns_stock(self):
+        self.assertEqual(release_expired(now=self.later), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+        self.assertFalse(StockReservation.objects.exists())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.expired_at, self.later)
+
+    def test_late_payment_takes_the_stock_again(self):
+        release_expired(now=self.later)
+        Payment.objects.create(order=self.order, amount=10, method="card", status="PAID")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.expired_at)
+
+    def test_late_payment_is_rejected_when_the_stock_is_gone(self):
+        release_expired(now=self.later)
+        place_order([(self.product.id, 4)], customer=self.customer)
+        response = APIClient().post(
+            "/api/v1/payments/", {"order": self.order.id, "amount": "10.00", "method": "card", "status": "PAID"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["items"][0]["available"], 1)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_payment_confirms_reservation(self):
+        Payment.objects.create(order=self.order, amount=10, method="card", status="PAID")
+        self.assertEqual(release_expired(now=self.later), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs real row locks (PostgreSQL)")
+class ReservationRaceTest(TransactionTestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Plain", stock_quantity=5, current_price=5)
+        self.order = place_order([(self.product.id, 2)], customer=customer)
+
+    def test_payment_during_expiry_takes_the_stock_again(self):
+        holding = threading.Event()
+        return_stock = inventory._return_stock
+
+        def slow_return_stock(reservations):
+            # release_expired now holds the order lock; let the payment run into it
+            restocked = return_stock(reservations)
+            holding.set()
+            time.sleep(0.5)
+            return restocked
+
+        def expire():
+            try:
+                release_expired(now=timezone.now() + timedelta(days=1))
+            finally:
+                connection.close()
+
+        with mock.patch.object(inventory, "_return_stock", slow_return_stock):
+            releaser = threading.Thread(target=expire)
+            releaser.start()
+            self.assertTrue(holding.wait(5))
+            Payment.objects.create(order=self.order, amount=10, method="card", status="PAID")
+            releaser.join()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+        self.assertIsNone(Order.objects.get(pk=self.order.pk).expired_at)
+        self.assertFalse(StockReservation.objects.exists())
@@ -0,0 +1,86 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from store.models import Customer, Order, OrderItem, Outbox, Product
+from store.orders import InsufficientStock, place_order
+
+
+class PlaceOrderTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name="Test", last_name="User", email="test@example.com"
+        )
+        self.products = [
+            Product.objects.create(name=f"Item {i}", stock_quantity=10, current_price=5)
+            for i in range(20)
+        ]
+
+    def _queries_for(self, products):
+        with CaptureQueriesContext(connection) as ctx:
+            place_order([(p.pk, 1) for p in products], customer=self.customer)
+        return len(ctx.captured_queries)
+
+    def test_query_count_independent_of_cart_size(self):
+        # One stock UPDATE covers the whole cart
+        self.assertEqual(self._queries_for(self.products[:1]), self._queries_for(self.products))
+
+    def test_stock_is_not_read_before_the_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            place_order([(self.products[0].pk, 1)], customer=self.customer)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("SELECT") and "store_product" in q["sql"]])
+
+    def test_places_order_and_decrements_stock(self):
+        first, second = self.products[:2]
+        order = place_order([(first.pk, 2), (second.pk, 3), (first.pk, 1)], customer=self.customer)
+
+        self.assertEqual(order.total_due, 30)
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 3)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.stock_quantity, 7)
+        self.assertEqual(second.stock_quantity, 7)
+        self.assertTrue(Outbox.objects.filter(event_type="ORDER_PLACED").exists())
+
+    def test_insufficient_stock_rolls_back(self):
+        first, second = self.products[:2]
+        with self.assertRaises(InsufficientStock) as ctx:
+            place_order([(first.pk, 1), (second.pk, 11)], customer=self.customer)
+
+        self.assertEqual(len(ctx.exception.errors), 1)
+        self.assertEqual(
+            {k: ctx.exception.errors[0][k] for k in ("product_id", "requested", "available")},
+            {"product_id": second.pk, "requested": 11, "available": 10},
+        )
+        self.assertFalse(Order.objects.exists())
+        first.refresh_from_db()
+        self.assertEqual(first.stock_quantity, 10)
+
+
+class OrderTotalRecalculationTest(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name="Test", last_name="User", email="t@example.com")
+        self.product = Product.objects.create(name="Widget", stock_quantity=100, current_price=2)
+        self.order = Order.objects.create(customer=customer)
+
+    def test_item_changes_are_coalesced_until_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for quantity in (1, 2, 3):
+                OrderItem.objects.create(order=self.order, product=self.product, quantity=quantity)
+            self.order.refresh_from_db()
+            self.assertEqual(self.order.total_due, 0)
+
+        self.assertEqual(len(callbacks), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_due, 12)
+
+    def test_recalculate_totals(self):
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self.order, product=self.product, quantity=5, price_at_purchase=3),
+        ])
+        empty = Order.objects.create(customer=self.order.customer, total_due=99)
+
+        self.assertEqual(Order.objects.recalculate_totals([self.order.pk, empty.pk]), 2)
+        self.order.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual(self.order.total_due, 15)
+        self.assertEqual(empty.total_due, 0)
@@ -0,0 +1,147 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from store.models import Customer, Order, OrderItem, Outbox, OutboxArchive, Payment, Product
+
+
+class InvoiceEnqueueTest(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name="Ada", last_name="Lovelace", email="ada@example.com")
+        product = Product.objects.create(name="Widget", stock_quantity=10, current_price=4)
+        self.order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(order=self.order, product=product, quantity=2)
+
+    def test_paid_payment_enqueues_invoice_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(order=self.order, amount=8, method="card", status="PAID")
+            self.assertFalse(Outbox.objects.filter(event_type="GENERATE_INVOICE").exists())
+
+        event = Outbox.objects.get(event_type="GENERATE_INVOICE")
+        self.assertEqual(event.status, "pending")
+        self.assertEqual(event.payload["customer_name"], "Ada Lovelace")
+        self.assertEqual(event.payload["items"], [{"name": "Widget", "price": 4.0, "quantity": 2}])
+
+    def test_unpaid_payment_enqueues_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(order=self.order, amount=8, method="card")
+        self.assertFalse(Outbox.objects.filter(event_type="GENERATE_INVOICE").exists())
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.posted = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posted.append(json["order_id"])
+        return FakeResponse(self.status_code)
+
+    def close(self):
+        pass
+
+
+class OutboxRelayTest(TestCase):
+    def setUp(self):
+        Outbox.objects.bulk_create(
+            [Outbox(event_type="GENERATE_INVOICE", payload={"order_id": str(i)}) for i in range(5)]
+            + [Outbox(event_type="ORDER_PLACED", payload={"order_id": 99})]
+        )
+
+    def _relay(self, session, batch_size=100):
+        from store.outbox import OutboxRelay
+        relay = OutboxRelay(batch_size=batch_size, concurrency=4, session=session)
+        try:
+            return relay.relay_batch()
+        finally:
+            relay.close()
+
+    def test_batch_is_delivered_and_marked_sent(self):
+        session = FakeSession()
+        self.assertEqual(self._relay(session), 6)
+        self.assertEqual(sorted(session.posted), ["0", "1", "2", "3", "4"])
+        self.assertEqual(Outbox.objects.filter(status="sent").count(), 6)
+
+    def test_failed_delivery_is_marked_failed(self):
+        self._relay(FakeSession(status_code=503), batch_size=2)
+        self.assertEqual(Outbox.objects.filter(status="failed").count(), 2)
+        self.assertEqual(Outbox.objects.filter(status="pending").count(), 4)
+
+    def test_failed_events_back_off(self):
+        session = FakeSession(status_code=503)
+        self._relay(session)
+        failed = Outbox.objects.filter(status="failed")
+        self.assertEqual(failed.count(), 5)
+        self.assertTrue(all(event.attempts == 1 and event.next_attempt_at > timezone.now() for event in failed))
+
+        # Nothing is due yet, so a second pass must not retry anything
+        session.posted.clear()
+        self.assertEqual(self._relay(session), 0)
+        self.assertEqual(session.posted, [])
+
+    def test_claimed_batch_is_leased_to_one_relay(self):
+        from store.outbox import OutboxRelay
+        first, second = OutboxRelay(batch_size=4, session=FakeSession()), OutboxRelay(session=FakeSession())
+        try:
+            self.assertEqual(len(first.claim()), 4)
+            # The claim has committed; the lease alone keeps its rows from the other relay
+            self.assertEqual(len(second.claim()), 2)
+            self.assertEqual(second.claim(), [])
+        finally:
+            first.close()
+            second.close()
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=3)
+    def test_exhausted_events_are_dead_lettered(self):
+        Outbox.objects.update(attempts=2)
+        self._relay(FakeSession(status_code=503))
+        self.assertEqual(Outbox.objects.filter(status="dead").count(), 5)
+
+
+class OutboxRetentionTest(TestCase):
+    def setUp(self):
+        old = timezone.now() - timedelta(days=30)
+        Outbox.objects.bulk_create([
+            Outbox(event_type="ORDER_PLACED", payload={"n": i}, status=status)
+            for i, status in enumerate(["sent", "sent", "dead", "pending"])
+        ])
+        Outbox.objects.update(created_at=old)
+        Outbox.objects.create(event_type="ORDER_PLACED", payload={"n": 9}, status="sent")
+
+    def test_archive_moves_only_old_delivered_events(self):
+        from store.outbox import archive_events, retention_cutoff
+        cutoff = retention_cutoff(7)
+        self.assertEqual(archive_events(cutoff, chunk_size=2), 2)
+        self.assertEqual(archive_events(cutoff, chunk_size=2), 1)
+        self.assertEqual(archive_events(cutoff, chunk_size=2), 0)
+
+        self.assertEqual(OutboxArchive.objects.count(), 3)
+        self.assertEqual(sorted(Outbox.objects.values_list("status", flat=True)), ["pending", "sent"])
+
+    def test_api_reads_archived_ranges(self):
+        from store.outbox import archive_events, retention_cutoff
+        archive_events(retention_cutoff(7))
+        client = APIClient()
+
+        self.assertEqual(len(client.get("/api/v1/outbox/").json()["results"]), 2)
+        self.assertEqual(len(client.get("/api/v1/outbox/", {"archived": "true"}).json()["results"]), 3)
+        before = (timezone.now() - timedelta(days=10)).date().isoformat()
+        # Old bounds read both tables: the old pending event never leaves the hot one
+        results = client.get("/api/v1/outbox/", {"created_at__lt": before}).json()["results"]
+        self.assertEqual(sorted(row["status"] for row in results), ["dead", "pending", "sent", "sent"])
+        self.assertEqual(len(client.get("/api/v1/outbox/", {"created_at__lt": before, "status": "pending"}).json()["results"]), 1)
+
+        # A range straddling the cutoff pages through both tables, newest first
+        since = (timezone.now() - timedelta(days=60)).date().isoformat()
+        seen, params, url = [], {"created_at__gte": since, "page_size": 2}, "/api/v1/outbox/"
+        while url:
+            body = client.get(url, params).json()
+            seen += [row["payload"]["n"] for row in body["results"]]
+            url, params = body["next"], None
+        self.assertEqual(seen[0], 9)
+        self.assertEqual(sorted(seen), [0, 1, 2, 3, 9])
@@ -0,0 +1,34 @@
+from unittest import mock
+import requests
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from store.services import CircuitOpen, ServiceClient, ServiceUnavailable
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return [{"id": 1}]
+
+
+class ServiceClientTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = ServiceClient("test", "http://test-service", cache_ttl=10)
+
+    def test_responses_are_cached(self):
+        with mock.patch.object(self.client.session, "request", return_value=FakeResponse()) as request:
+            self.assertEqual(self.client.get_json("/items"), [{"id": 1}])
+            self.assertEqual(self.client.get_json("/items"), [{"id": 1}])
+        self.assertEqual(request.call_count, 1)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        failing = mock.patch.object(self.client.session, "request", side_effect=requests.ConnectionError("down"))
+        with failing as request:
+            for _ in range(self.client.breaker.failure_threshold):
+                with self.assertRaises(ServiceUnavailable):
+                    self.client.get_json("/items", cache_ttl=0)
+            with self.assertRaises(CircuitOpen):
+                self.client.get_json("/items", cache_ttl=0)
+        self.assertEqual(request.call_count, self.client.breaker.failure_threshold)
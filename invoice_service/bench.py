@@ -0,0 +1,84 @@
+# bench.py
+"""
+Invoices/second against a running invoice service at several client
+concurrencies:
+
+    python bench.py --url http://localhost:8001 --requests 200 --concurrency 1 4 16
+
+429 responses (renderer saturated) are counted separately and not retried.
+
+``--render`` times render.py in this process instead, for invoices of the
+given line counts (no service needed):
+
+    python bench.py --render 1 100 5000
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def payload(n, items):
+    return {
+        "order_id": f"bench-{n}",
+        "customer_name": "Bench Customer",
+        "amount": 10.0 * items,
+        "items": [{"name": f"Item {i}", "price": 10.0} for i in range(items)],
+    }
+
+
+def run_render(lines, repeat):
+    from render import paginate, render_invoice, warm_worker
+
+    warm_worker()
+    data = payload(0, lines)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        pdf_out = render_invoice(data)
+    elapsed = (time.perf_counter() - started) / repeat
+    return elapsed, len(paginate(lines)), len(pdf_out)
+
+
+def run(url, total, concurrency, items):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def call(n):
+        return session.post(f"{url}/generate-invoice/", json=payload(n, items), timeout=60).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(call, range(total)))
+    elapsed = time.perf_counter() - started
+    ok = statuses.count(200)
+    return ok / elapsed, ok, statuses.count(429), len(statuses) - ok - statuses.count(429)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--items", type=int, default=10, help="Line items per invoice")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--render", type=int, nargs="+", metavar="LINES", help="Time local renders of LINES-line invoices")
+    parser.add_argument("--repeat", type=int, default=5, help="Renders per size with --render")
+    args = parser.parse_args()
+
+    if args.render:
+        print(f"{'lines':>8} {'pages':>6} {'ms':>9} {'ms/line':>8} {'KB':>7}")
+        for lines in args.render:
+            elapsed, pages, size = run_render(lines, args.repeat)
+            print(f"{lines:>8} {pages:>6} {elapsed * 1000:>9.1f} {elapsed * 1000 / lines:>8.3f} {size / 1024:>7.1f}")
+        return
+
+    print(f"{'clients':>8} {'invoices/s':>11} {'ok':>6} {'429':>6} {'errors':>7}")
+    for concurrency in args.concurrency:
+        rate, ok, busy, errors = run(args.url.rstrip("/"), args.requests, concurrency, args.items)
+        print(f"{concurrency:>8} {rate:>11.1f} {ok:>6} {busy:>6} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,382 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import Response
+import asyncio
+import json
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from reportlab.pdfgen import canvas
-from io import BytesIO
 
-app = FastAPI(title="Invoice Generation Service")
+from render import render_invoice, warm_worker
+from store import InvoiceStore, digest
+
+# Rendering runs in a pool of warm worker processes so the event loop stays free.
+# Requests beyond RENDER_QUEUE_LIMIT (running + waiting) are refused with a 429.
+RENDER_WORKERS = int(os.environ.get("INVOICE_RENDER_WORKERS", os.cpu_count() or 1))
+RENDER_QUEUE_LIMIT = int(os.environ.get("INVOICE_RENDER_QUEUE_LIMIT", RENDER_WORKERS * 4))
+# Renders in flight (pool-wide) up to which batch requests may add more; the
+# rest of RENDER_QUEUE_LIMIT is left to single requests
+BATCH_WINDOW = int(os.environ.get("INVOICE_BATCH_WINDOW", max(1, RENDER_QUEUE_LIMIT // 2)))
+
+
+class RenderPool:
+    def __init__(self, workers, queue_limit):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.executor = None
+        self.restarts = 0
+        # Set whenever a render finishes, for batches waiting on a free slot
+        self.freed = asyncio.Event()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+
+    def start(self):
+        self.executor = self._new_executor()
+        # Start every worker now rather than on the first requests
+        for future in [self.executor.submit(int) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _submit(self, payload):
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self.executor, render_invoice, payload)
+        except BrokenProcessPool:
+            # A worker died (OOM kill, crash in a C extension); the executor
+            # refuses all work from then on, so a fresh one takes over
+            broken, self.executor = self.executor, self._new_executor()
+            broken.shutdown(wait=False)
+            self.restarts += 1
+            future = loop.run_in_executor(self.executor, render_invoice, payload)
+        self.in_flight += 1
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        self.in_flight -= 1
+        self.freed.set()
+
+    async def render(self, payload):
+        if self.in_flight >= self.queue_limit:
+            raise HTTPException(
+                status_code=429,
+                detail="Invoice renderer is busy, retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            return await self._submit(payload)
+        except BrokenProcessPool:
+            # Renders that were running when a worker died; the next request gets a new pool
+            raise HTTPException(
+                status_code=503,
+                detail="Invoice renderer restarted, retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+
+    async def render_many(self, payloads, window, on_submit=None):
+        """
+        Yields ``(payload, pdf bytes or exception)`` in completion order.
+        Renders are only queued while fewer than ``window`` are in flight in
+        the whole pool, single requests and other batches included, so any
+        number of concurrent batches stays within that share of the queue.
+        ``on_submit(payload, future)`` is called as each render is queued.
+        """
+        payloads = deque(payloads)
+        window = min(window, self.queue_limit)
+        running = {}
+
+        def refill():
+            while payloads and self.in_flight < window:
+                payload = payloads.popleft()
+                future = self._submit(payload)
+                running[future] = payload
+                if on_submit is not None:
+                    on_submit(payload, future)
+
+        refill()
+        while running or payloads:
+            if not running:
+                # Everything in flight belongs to other requests: wait for a slot
+                self.freed.clear()
+                await self.freed.wait()
+                refill()
+                continue
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                payload = running.pop(future)
+                yield payload, future.exception() or future.result()
+            refill()
+
+
+class SingleFlight:
+    """
+    At most one render per payload digest at a time. Requests for a digest
+    that is already being rendered await that render and get the same bytes
+    (or the same error) instead of queueing another one; a retry storm for
+    one order costs a single render.
+    """
+
+    def __init__(self):
+        self.running = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """The render in flight for ``key``, or None."""
+        return self.running.get(key)
+
+    def add(self, key, future):
+        """Publishes ``future`` as the render of ``key`` until it completes."""
+        if key in self.running:
+            return
+        self.running[key] = future
+        self.leaders += 1
+
+        def finished(_):
+            if self.running.get(key) is future:
+                del self.running[key]
+
+        future.add_done_callback(finished)
+
+    async def join(self, future):
+        self.coalesced += 1
+        # Shielded: a waiter that goes away must not cancel the others' render
+        return await asyncio.shield(future)
+
+    async def do(self, key, work):
+        """
+        Returns ``(result, coalesced)``: awaits the render in flight for
+        ``key`` if there is one, otherwise runs ``work()`` as that render.
+        """
+        future = self.get(key)
+        if future is not None:
+            return await self.join(future), True
+        future = asyncio.ensure_future(work())
+        self.add(key, future)
+        return await asyncio.shield(future), False
+
+
+render_pool = RenderPool(RENDER_WORKERS, RENDER_QUEUE_LIMIT)
+flights = SingleFlight()
+invoice_store = InvoiceStore()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    render_pool.start()
+    yield
+    render_pool.shutdown()
+
+
+app = FastAPI(title="Invoice Generation Service", lifespan=lifespan)
 @app.get("/") 
 def root(): 
     return {"status": "success", "message": "Invoice API is live"} 
 
 @app.get("/health") 
 def health(): 
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "render_workers": render_pool.workers,
+        "render_in_flight": render_pool.in_flight,
+        "render_queue_limit": render_pool.queue_limit,
+        "render_pool_restarts": render_pool.restarts,
+        "render_digests_in_flight": len(flights.running),
+        "renders_started": flights.leaders,
+        "renders_coalesced": flights.coalesced,
+    }
 
 @app.get("/api/v1/invoices")
-def invoices_root():
-    return {"status": "success", "message": "Invoices endpoint is live"}
+def list_invoices(
+    limit: int = Query(50, ge=1, le=500),
+    before: int | None = None,
+    order_id: str | None = None,
+    include_count: bool = False,
+):
+    """
+    Stored invoices, newest first. Pass ``next_before`` back as ``before`` for
+    the next page. ``count`` (a full COUNT(*) of the index) is only computed
+    with ``?include_count=true``; otherwise it is null.
+    """
+    results = invoice_store.list(limit=limit, before=before, order_id=order_id)
+    for row in results:
+        row["invoice_id"] = row["digest"][:12]
+    next_before = results[-1]["id"] if len(results) == limit else None
+    count = invoice_store.count() if include_count else None
+    return {"count": count, "next_before": next_before, "results": results}
+
+@app.get("/api/v1/invoices/{key}.pdf")
+def get_invoice_pdf(key: str, request: Request):
+    # A 304 is only for invoices that exist; a stale ETag for anything else is a 404
+    if len(key) != 64 or not invoice_store.exists(key):
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    if _not_modified(request, key):
+        return Response(status_code=304, headers={"ETag": _etag(key)})
+    pdf_out = invoice_store.read(key)
+    if pdf_out is None:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    return _pdf_response(pdf_out, key, f"invoice_{key[:12]}.pdf")
+
+
+class InvoiceItem(BaseModel):
+    name: str
+    price: float  # unit price
+    quantity: int = 1
 
 
 class InvoiceData(BaseModel):
     order_id: str
     customer_name: str
     amount: float
-    items: list[dict] # list of {"name": str, "price": float}
+    items: list[InvoiceItem]
+
+def _etag(key):
+    return f'"{key}"'
+
+
+def _not_modified(request, key):
+    tags = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    return _etag(key) in tags or "*" in tags
+
+
+def _pdf_response(pdf_out, key, filename, cache_status=None):
+    headers = {"Content-Disposition": f"attachment; filename={filename}", "ETag": _etag(key)}
+    if cache_status:
+        headers["X-Invoice-Cache"] = cache_status
+    return Response(content=pdf_out, media_type="application/pdf", headers=headers)
+
 
 @app.post("/generate-invoice/")
-async def generate_invoice(data: InvoiceData):
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer)
-
-    # --- Draw Invoice Header ---
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(100, 800, "OFFICIAL INVOICE")
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(100, 780, f"Order ID: {data.order_id}")
-    p.drawString(100, 760, f"Customer: {data.customer_name}")
-    p.drawString(100, 740, f"Total Amount: ${data.amount:.2f}")
-
-    # --- Draw Items Table ---
-    y_position = 700
-    p.drawString(100, y_position, "Items:")
-    y_position -= 20
-    
-    for item in data.items:
-        p.drawString(120, y_position, f"- {item['name']}: ${item['price']:.2f}")
-        y_position -= 20
-
-    p.showPage()
-    p.save()
-
-    pdf_out = buffer.getvalue()
-    buffer.close()
-
-    return Response(
-        content=pdf_out,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=invoice_{data.order_id}.pdf"}
-    )
\ No newline at end of file
+async def generate_invoice(data: InvoiceData, request: Request):
+    """
+    Returns the invoice PDF, rendering it only if this exact payload has not
+    been rendered before. Concurrent requests for the same payload share one
+    render (X-Invoice-Cache: COALESCED). A matching If-None-Match gets a 304.
+    """
+    payload = data.model_dump()
+    key = digest(payload)
+    # The store does blocking file and SQLite IO, so it runs off the event loop
+    if _not_modified(request, key) and await asyncio.to_thread(invoice_store.exists, key):
+        return Response(status_code=304, headers={"ETag": _etag(key)})
+
+    pdf_out = await asyncio.to_thread(invoice_store.read, key)
+    cache_status = "HIT"
+    if pdf_out is None:
+        async def render():
+            result = await render_pool.render(payload)
+            await asyncio.to_thread(invoice_store.save, key, payload, result)
+            return result
+
+        pdf_out, coalesced = await flights.do(key, render)
+        cache_status = "COALESCED" if coalesced else "MISS"
+
+    return _pdf_response(pdf_out, key, f"invoice_{data.order_id}.pdf", cache_status)
+
+
+class _ZipSink:
+    """Write-only file object for zipfile that hands back what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _pdf_name(order_id):
+    return f"invoice_{re.sub(r'[^A-Za-z0-9._-]', '_', order_id)}.pdf"
+
+
+def _unique_payloads(payloads):
+    """
+    ``(key, payload, file name)`` per distinct payload: a payload sent twice
+    in one batch is rendered and written once, and different payloads for
+    the same order get their digest in the name so no two entries collide.
+    """
+    seen, names = set(), set()
+    for payload in payloads:
+        key = digest(payload)
+        if key in seen:
+            continue
+        seen.add(key)
+        name = _pdf_name(payload["order_id"])
+        if name in names:
+            name = _pdf_name(f"{payload['order_id']}_{key[:12]}")
+        names.add(name)
+        yield key, payload, name
+
+
+async def _zip_invoices(payloads):
+    sink = _ZipSink()
+    errors = []
+    # PDFs are stored, not deflated, so the event loop only copies bytes
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+        # Stored invoices go out first; only the rest is rendered, and
+        # invoices already being rendered for another request are awaited
+        missing, joined, names = [], [], {}
+        for key, payload, name in _unique_payloads(payloads):
+            names[key] = name
+            pdf_out = await asyncio.to_thread(invoice_store.read, key)
+            if pdf_out is None:
+                future = flights.get(key)
+                if future is None:
+                    missing.append(payload)
+                else:
+                    joined.append((key, payload, future))
+                continue
+            archive.writestr(name, pdf_out)
+            yield sink.drain()
+
+        def publish(payload, future):
+            flights.add(digest(payload), future)
+
+        async for payload, result in render_pool.render_many(missing, BATCH_WINDOW, on_submit=publish):
+            if isinstance(result, Exception):
+                errors.append({"order_id": payload["order_id"], "error": str(result)})
+                continue
+            key = digest(payload)
+            await asyncio.to_thread(invoice_store.save, key, payload, result)
+            archive.writestr(names[key], result)
+            yield sink.drain()
+
+        for key, payload, future in joined:
+            try:
+                result = await flights.join(future)
+            except Exception as e:
+                errors.append({"order_id": payload["order_id"], "error": str(e)})
+                continue
+            archive.writestr(names[key], result)
+            yield sink.drain()
+        if errors:
+            archive.writestr("errors.json", json.dumps(errors, indent=2))
+    yield sink.drain()
+
+
+@app.post("/generate-invoices/")
+async def generate_invoices(batch: list[InvoiceData]):
+    """Renders every invoice in ``batch`` in parallel and streams them back as a ZIP, each PDF as it finishes."""
+    return StreamingResponse(
+        _zip_invoices([data.model_dump() for data in batch]),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=invoices.zip"},
+    )
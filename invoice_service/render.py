@@ -0,0 +1,198 @@
+# render.py
+"""
+PDF rendering, run in the worker processes of main.py's render pool.
+
+Everything here is module-level so it can be pickled into a
+ProcessPoolExecutor; ``warm_worker`` runs once per process so fonts and
+ReportLab's lazy imports are loaded before the first real invoice.
+
+Layout: line items are drawn as a table (item, quantity, unit price, line
+total) and split over as many A4 pages as needed; the last page also carries
+the totals. The page geometry, column positions and page capacities are
+computed once at import, i.e. once per worker. The static page furniture
+(header, table heading, footer) is drawn once per document as form XObjects
+and placed on each page with ``doForm``, so a page costs its rows plus a few
+operators. A form XObject belongs to the PDF it is defined in, so it cannot
+be shared between documents; defining the three forms is the fixed cost of
+an invoice.
+"""
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+FONTS = ("Helvetica", "Helvetica-Bold")
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+LEFT, RIGHT = 50, PAGE_WIDTH - 50
+BODY_SIZE = 10
+ROW_HEIGHT = 16
+
+# Table columns: (heading, x, align); right-aligned text ends at x
+COLUMNS = (
+    ("Item", LEFT, "left"),
+    ("Qty", 370, "right"),
+    ("Unit Price", 460, "right"),
+    ("Line Total", RIGHT, "right"),
+)
+NAME_WIDTH = 370 - 40 - LEFT
+
+FIRST_TABLE_TOP = 680  # table heading baseline on page 1, below the order details
+TABLE_TOP = 750  # ... and on the following pages
+TABLE_BOTTOM = 70  # lowest row baseline, above the footer
+TOTALS_ROWS = 3  # rule, subtotal and total under the last row
+
+
+def _capacity(top):
+    return int((top - ROW_HEIGHT - TABLE_BOTTOM) // ROW_HEIGHT) + 1
+
+
+FIRST_PAGE_ROWS = _capacity(FIRST_TABLE_TOP)
+PAGE_ROWS = _capacity(TABLE_TOP)
+
+
+def paginate(count):
+    """Splits ``count`` rows into per-page ``(start, stop)`` ranges; the last page keeps room for the totals."""
+    pages = []
+    start, capacity = 0, FIRST_PAGE_ROWS
+    while True:
+        stop = min(start + capacity, count)
+        pages.append((start, stop))
+        if stop == count and stop - start + TOTALS_ROWS <= capacity:
+            return pages
+        start, capacity = stop, PAGE_ROWS
+
+
+def _width(text, font="Helvetica", size=BODY_SIZE):
+    return pdfmetrics.stringWidth(text, font, size)
+
+
+@lru_cache(maxsize=4096)
+def _fit_name(name):
+    """``name`` cut to the item column; product names repeat, so each worker measures one once."""
+    if _width(name) <= NAME_WIDTH:
+        return name
+    while name and _width(name + "...") > NAME_WIDTH:
+        name = name[:-1]
+    return name + "..."
+
+
+def _money(value):
+    return f"${value:,.2f}"
+
+
+def _define_forms(p):
+    """Draws the static page furniture into form XObjects of this document."""
+    p.beginForm("header")
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(LEFT, 790, "OFFICIAL INVOICE")
+    p.setLineWidth(0.5)
+    p.line(LEFT, 780, RIGHT, 780)
+    p.endForm()
+
+    # Drawn relative to the heading baseline, which differs on page 1
+    p.beginForm("table_head", lowery=-ROW_HEIGHT, upperx=PAGE_WIDTH, uppery=ROW_HEIGHT)
+    p.setFont("Helvetica-Bold", BODY_SIZE)
+    for heading, x, align in COLUMNS:
+        if align == "right":
+            p.drawRightString(x, 0, heading)
+        else:
+            p.drawString(x, 0, heading)
+    p.setLineWidth(0.5)
+    p.line(LEFT, -5, RIGHT, -5)
+    p.endForm()
+
+    p.beginForm("footer")
+    p.setLineWidth(0.5)
+    p.line(LEFT, 50, RIGHT, 50)
+    p.setFont("Helvetica", 9)
+    p.drawString(LEFT, 36, "Thank you for your business.")
+    p.endForm()
+
+
+def _draw_table_head(p, y):
+    p.saveState()
+    p.translate(0, y)
+    p.doForm("table_head")
+    p.restoreState()
+
+
+def _draw_rows(p, items, y):
+    """Draws one text object of rows from baseline ``y`` down; returns the baseline below the last row."""
+    text = p.beginText()
+    text.setFont("Helvetica", BODY_SIZE)
+    for item in items:
+        quantity = item.get("quantity", 1)
+        cells = (str(quantity), _money(item["price"]), _money(item["price"] * quantity))
+        text.setTextOrigin(LEFT, y)
+        text.textOut(_fit_name(item["name"]))
+        for (_, x, _), cell in zip(COLUMNS[1:], cells):
+            text.setTextOrigin(x - _width(cell), y)
+            text.textOut(cell)
+        y -= ROW_HEIGHT
+    p.drawText(text)
+    return y
+
+
+def _draw_totals(p, data, y):
+    subtotal = sum(item["price"] * item.get("quantity", 1) for item in data["items"])
+    p.setLineWidth(0.5)
+    p.line(COLUMNS[2][1] - 80, y + ROW_HEIGHT - 5, RIGHT, y + ROW_HEIGHT - 5)
+    y -= 2
+    for label, value in (("Subtotal", subtotal), ("Total Amount", data["amount"])):
+        p.setFont("Helvetica-Bold", BODY_SIZE)
+        p.drawRightString(COLUMNS[2][1], y, label)
+        p.setFont("Helvetica", BODY_SIZE)
+        p.drawRightString(RIGHT, y, _money(value))
+        y -= ROW_HEIGHT
+
+
+def render_invoice(data):
+    """Renders ``data`` (an InvoiceData dict) and returns the PDF bytes."""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    p.setTitle(f"Invoice {data['order_id']}")
+    _define_forms(p)
+
+    items = data["items"]
+    pages = paginate(len(items))
+    for number, (start, stop) in enumerate(pages, start=1):
+        p.doForm("header")
+        p.doForm("footer")
+        p.setFont("Helvetica", 9)
+        p.drawRightString(RIGHT, 36, f"Page {number} of {len(pages)}")
+
+        top = TABLE_TOP
+        if number == 1:
+            top = FIRST_TABLE_TOP
+            p.setFont("Helvetica", 12)
+            p.drawString(LEFT, 750, f"Order ID: {data['order_id']}")
+            p.drawString(LEFT, 732, f"Customer: {data['customer_name']}")
+            p.drawString(LEFT, 714, f"Total Amount: {_money(data['amount'])}")
+
+        y = top - ROW_HEIGHT
+        if stop > start or number == 1:
+            _draw_table_head(p, top)
+            y = _draw_rows(p, items[start:stop], y)
+        if number == len(pages):
+            _draw_totals(p, data, y)
+        p.showPage()
+
+    p.save()
+    pdf_out = buffer.getvalue()
+    buffer.close()
+    return pdf_out
+
+
+def warm_worker():
+    """Process-pool initializer: loads fonts and renders once so later calls start hot."""
+    for name in FONTS:
+        pdfmetrics.getFont(name)
+    render_invoice({
+        "order_id": "warmup",
+        "customer_name": "",
+        "amount": 0,
+        "items": [{"name": "warmup", "price": 0, "quantity": 1}],
+    })
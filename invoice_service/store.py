@@ -0,0 +1,111 @@
+# store.py
+"""
+Content-addressed store for rendered invoices.
+
+A PDF is keyed by the SHA-256 of its canonical payload (sorted-key JSON plus
+RENDER_VERSION), so the same order sent again by the relay, the payment
+signal or the admin is served from disk instead of re-rendered. Files live
+under INVOICE_STORE_DIR as ``ab/abcdef....pdf``; a SQLite index next to them
+records one row per invoice for the listing endpoint.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# Bump when the PDF layout changes so stored invoices are rendered afresh
+RENDER_VERSION = "2"
+
+STORE_DIR = os.environ.get("INVOICE_STORE_DIR", os.path.join(os.path.dirname(__file__), "data", "invoices"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL UNIQUE,
+    order_id TEXT NOT NULL,
+    customer_name TEXT NOT NULL,
+    amount REAL NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS invoices_order_id ON invoices (order_id);
+"""
+
+LIST_COLUMNS = ["id", "digest", "order_id", "customer_name", "amount", "size", "created_at"]
+
+
+def digest(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{RENDER_VERSION}\n{canonical}".encode()).hexdigest()
+
+
+class InvoiceStore:
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # One connection per process, shared by the event loop and threads
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    def read(self, key):
+        """The stored PDF for ``key``, or None."""
+        try:
+            with open(self.path(key), "rb") as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def save(self, key, payload, pdf):
+        """Writes the PDF (atomically) and indexes it; a second save of the same key is a no-op."""
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(tmp_path, "wb") as handle:
+                handle.write(pdf)
+            os.replace(tmp_path, path)
+
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR IGNORE INTO invoices (digest, order_id, customer_name, amount, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    str(payload["order_id"]),
+                    payload["customer_name"],
+                    payload["amount"],
+                    len(pdf),
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                ),
+            )
+
+    def list(self, limit=50, before=None, order_id=None):
+        """Newest first; ``before`` is the ``id`` of the last row of the previous page."""
+        clauses, params = [], []
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        if order_id is not None:
+            clauses.append("order_id = ?")
+            params.append(order_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {', '.join(LIST_COLUMNS)} FROM invoices {where} ORDER BY id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(zip(LIST_COLUMNS, row)) for row in rows]
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# main.py opens its module-level store on import; keep it out of the source tree
+os.environ.setdefault("INVOICE_STORE_DIR", tempfile.mkdtemp(prefix="invoice-tests-"))
@@ -0,0 +1,89 @@
+# tests/helpers.py
+"""
+Runs the app against a temporary store and a render pool whose workers are
+threads calling ``StubRenderer`` instead of ReportLab, so tests can count
+renders, hold them at a gate and make them fail.
+"""
+import asyncio
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import httpx
+
+import main
+from store import InvoiceStore
+
+
+def payload(order_id="1001", amount=20.0, **extra):
+    return {
+        "order_id": order_id,
+        "customer_name": "Ada Lovelace",
+        "amount": amount,
+        "items": [{"name": "Widget", "price": 10.0, "quantity": 2}],
+        **extra,
+    }
+
+
+class StubRenderer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.error = None
+
+    def __call__(self, data):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            self.gate.wait(5)
+            if self.error is not None:
+                raise self.error
+            return f"%PDF-stub {data['order_id']} {data['amount']}".encode()
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class ServiceTestCase(unittest.IsolatedAsyncioTestCase):
+    workers = 4
+    queue_limit = 16
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = InvoiceStore(directory.name)
+        self.addCleanup(self.store.db.close)
+
+        self.pool = main.RenderPool(self.workers, self.queue_limit)
+        self.pool.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.addCleanup(self.pool.executor.shutdown)
+        self.renderer = StubRenderer()
+        # Whatever a test leaves at the gate is let through before the pool shuts down
+        self.addCleanup(self.renderer.gate.set)
+
+        for name, value in [
+            ("invoice_store", self.store),
+            ("render_pool", self.pool),
+            ("flights", main.SingleFlight()),
+            ("render_invoice", self.renderer),
+        ]:
+            patcher = mock.patch.object(main, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def client(self):
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        return httpx.AsyncClient(transport=transport, base_url="http://invoice")
+
+    async def wait_until(self, condition, timeout=5):
+        async with asyncio.timeout(timeout):
+            while not condition():
+                await asyncio.sleep(0.005)
@@ -0,0 +1,81 @@
+import asyncio
+import io
+import json
+import zipfile
+from unittest import mock
+
+import main
+from store import digest
+from tests.helpers import ServiceTestCase, payload
+
+
+class BatchZipTest(ServiceTestCase):
+    async def post_batch(self, batch):
+        async with self.client() as client:
+            response = await client.post("/generate-invoices/", json=batch)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/zip")
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        self.assertIsNone(archive.testzip())
+        return archive
+
+    async def test_zip_holds_one_sanitised_member_per_distinct_payload(self):
+        repeated = payload("1001")
+        batch = [
+            repeated,
+            repeated,
+            payload("1001", amount=25.0),  # same order, different invoice
+            payload("../../etc/passwd"),
+            payload("spaces and/slashes\\too"),
+        ]
+        archive = await self.post_batch(batch)
+
+        names = archive.namelist()
+        self.assertEqual(len(names), 4)
+        self.assertEqual(len(set(names)), 4)
+        self.assertEqual(names.count("invoice_1001.pdf"), 1)
+        self.assertIn(f"invoice_1001_{digest(batch[2])[:12]}.pdf", names)
+        self.assertIn("invoice_.._.._etc_passwd.pdf", names)
+        self.assertIn("invoice_spaces_and_slashes_too.pdf", names)
+        self.assertTrue(all("/" not in name and "\\" not in name for name in names))
+        self.assertEqual(self.renderer.calls, 4)
+        self.assertEqual(archive.read("invoice_.._.._etc_passwd.pdf"), b"%PDF-stub ../../etc/passwd 20.0")
+
+    async def test_stored_invoices_are_reused_and_failures_listed(self):
+        async with self.client() as client:
+            await client.post("/generate-invoice/", json=payload("1001"))
+        self.renderer.error = RuntimeError("boom")
+
+        archive = await self.post_batch([payload("1001"), payload("1002")])
+
+        self.assertEqual(sorted(archive.namelist()), ["errors.json", "invoice_1001.pdf"])
+        self.assertEqual(json.loads(archive.read("errors.json")), [{"order_id": "1002", "error": "boom"}])
+        self.assertEqual(self.renderer.calls, 2)
+
+    async def test_batch_keeps_within_its_window(self):
+        self.renderer.gate.clear()
+        with mock.patch.object(main, "BATCH_WINDOW", 2):
+            batch = asyncio.ensure_future(self.post_batch([payload(str(n)) for n in range(8)]))
+            await self.wait_until(lambda: self.renderer.running == 2)
+            await asyncio.sleep(0.05)
+            # Pool has room for 16, but the batch holds at its window
+            self.assertEqual(self.pool.in_flight, 2)
+            self.renderer.gate.set()
+            archive = await batch
+        self.assertEqual(len(archive.namelist()), 8)
+        self.assertEqual(self.renderer.peak, 2)
+
+    async def test_stored_invoices_stream_before_renders_finish(self):
+        async with self.client() as client:
+            await client.post("/generate-invoice/", json=payload("1001"))
+        self.renderer.gate.clear()
+
+        chunks = main._zip_invoices([payload("1001"), payload("1002")])
+        first = await asyncio.wait_for(anext(chunks), 5)
+        self.assertIn(b"invoice_1001.pdf", first)
+
+        self.renderer.gate.set()
+        rest = b"".join([chunk async for chunk in chunks])
+        archive = zipfile.ZipFile(io.BytesIO(first + rest))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ["invoice_1001.pdf", "invoice_1002.pdf"])
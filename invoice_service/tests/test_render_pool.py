@@ -0,0 +1,60 @@
+import asyncio
+import os
+from unittest import mock
+
+import main
+import render
+from tests.helpers import ServiceTestCase, payload
+
+
+def crash(data):
+    # Stands in for a worker killed mid-render (OOM killer, segfault)
+    os._exit(1)
+
+
+class BackpressureTest(ServiceTestCase):
+    workers = 1
+    queue_limit = 1
+
+    async def test_full_queue_is_refused_with_429(self):
+        self.renderer.gate.clear()
+        async with self.client() as client:
+            first = asyncio.ensure_future(client.post("/generate-invoice/", json=payload("1001")))
+            await self.wait_until(lambda: self.pool.in_flight == 1)
+
+            refused = await client.post("/generate-invoice/", json=payload("1002"))
+            self.assertEqual(refused.status_code, 429)
+            self.assertEqual(refused.headers["Retry-After"], "1")
+
+            self.renderer.gate.set()
+            self.assertEqual((await first).status_code, 200)
+            # The slot is free again
+            self.assertEqual((await client.post("/generate-invoice/", json=payload("1002"))).status_code, 200)
+        self.assertEqual(self.renderer.calls, 2)
+
+
+class WorkerCrashTest(ServiceTestCase):
+    workers = 1
+
+    def setUp(self):
+        super().setUp()
+        # Real worker processes: a crash has to break the executor
+        self.pool.executor.shutdown()
+        self.pool.start()
+        self.addCleanup(self.pool.shutdown)
+
+    async def test_pool_is_replaced_after_a_worker_dies(self):
+        async with self.client() as client:
+            with mock.patch.object(main, "render_invoice", crash):
+                crashed = await client.post("/generate-invoice/", json=payload("1001"))
+            self.assertEqual(crashed.status_code, 503)
+            self.assertEqual(crashed.headers["Retry-After"], "1")
+
+            with mock.patch.object(main, "render_invoice", render.render_invoice):
+                retried = await client.post("/generate-invoice/", json=payload("1001"))
+            health = (await client.get("/health")).json()
+
+        self.assertEqual(retried.status_code, 200)
+        self.assertTrue(retried.content.startswith(b"%PDF"))
+        self.assertEqual(health["render_pool_restarts"], 1)
+        self.assertEqual(health["render_in_flight"], 0)
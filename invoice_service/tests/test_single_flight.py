@@ -0,0 +1,55 @@
+import asyncio
+import io
+import zipfile
+
+import main
+from tests.helpers import ServiceTestCase, payload
+
+
+class SingleFlightTest(ServiceTestCase):
+    async def test_concurrent_identical_requests_share_one_render(self):
+        self.renderer.gate.clear()
+        async with self.client() as client:
+            requests = [client.post("/generate-invoice/", json=payload()) for _ in range(5)]
+
+            async def release():
+                await self.wait_until(lambda: main.flights.coalesced == 4)
+                self.renderer.gate.set()
+
+            *responses, _ = await asyncio.gather(*requests, release())
+
+        self.assertEqual(self.renderer.calls, 1)
+        self.assertEqual({r.status_code for r in responses}, {200})
+        self.assertEqual(len({r.content for r in responses}), 1)
+        self.assertEqual(sorted(r.headers["X-Invoice-Cache"] for r in responses), ["COALESCED"] * 4 + ["MISS"])
+
+    async def test_failure_reaches_every_waiter_and_a_retry_renders_again(self):
+        self.renderer.gate.clear()
+        self.renderer.error = RuntimeError("font cache corrupt")
+        async with self.client() as client:
+            requests = [client.post("/generate-invoice/", json=payload()) for _ in range(3)]
+
+            async def release():
+                await self.wait_until(lambda: main.flights.coalesced == 2)
+                self.renderer.gate.set()
+
+            *responses, _ = await asyncio.gather(*requests, release())
+            self.assertEqual([r.status_code for r in responses], [500] * 3)
+            self.assertEqual(main.flights.running, {})
+
+            self.renderer.error = None
+            retry = await client.post("/generate-invoice/", json=payload())
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.headers["X-Invoice-Cache"], "MISS")
+        self.assertEqual(self.renderer.calls, 2)
+
+    async def test_batch_renders_each_distinct_payload_once(self):
+        first, second = payload("1001"), payload("1002")
+        async with self.client() as client:
+            response = await client.post("/generate-invoices/", json=[first, second, first, second, first])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.renderer.calls, 2)
+        names = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+        self.assertEqual(sorted(names), ["invoice_1001.pdf", "invoice_1002.pdf"])
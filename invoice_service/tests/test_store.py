@@ -0,0 +1,52 @@
+from tests.helpers import ServiceTestCase, payload
+from store import digest
+
+
+class InvoiceStoreTest(ServiceTestCase):
+    async def test_second_request_is_served_from_the_store(self):
+        async with self.client() as client:
+            first = await client.post("/generate-invoice/", json=payload())
+            second = await client.post("/generate-invoice/", json=payload())
+
+        self.assertEqual((first.headers["X-Invoice-Cache"], second.headers["X-Invoice-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first.headers["ETag"], f'"{digest(payload())}"')
+        self.assertEqual(self.renderer.calls, 1)
+
+    async def test_if_none_match_gets_304_only_for_stored_invoices(self):
+        key = digest(payload())
+        etag = {"If-None-Match": f'"{key}"'}
+        async with self.client() as client:
+            # Not stored yet: rendered, not a 304
+            self.assertEqual((await client.post("/generate-invoice/", json=payload(), headers=etag)).status_code, 200)
+            self.assertEqual((await client.post("/generate-invoice/", json=payload(), headers=etag)).status_code, 304)
+            self.assertEqual((await client.get(f"/api/v1/invoices/{key}.pdf", headers=etag)).status_code, 304)
+
+            stored = await client.get(f"/api/v1/invoices/{key}.pdf")
+            self.assertEqual(stored.status_code, 200)
+            self.assertEqual(stored.headers["content-type"], "application/pdf")
+
+    async def test_unknown_invoice_is_404(self):
+        unknown = "0" * 64
+        async with self.client() as client:
+            self.assertEqual((await client.get(f"/api/v1/invoices/{unknown}.pdf")).status_code, 404)
+            # Even with a matching ETag
+            response = await client.get(f"/api/v1/invoices/{unknown}.pdf", headers={"If-None-Match": f'"{unknown}"'})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual((await client.get("/api/v1/invoices/not-a-digest.pdf")).status_code, 404)
+
+    async def test_listing_pages_newest_first(self):
+        async with self.client() as client:
+            for n in range(3):
+                await client.post("/generate-invoice/", json=payload(f"{1000 + n}"))
+            first = (await client.get("/api/v1/invoices", params={"limit": 2})).json()
+            rest = (await client.get("/api/v1/invoices", params={"limit": 2, "before": first["next_before"]})).json()
+            counted = (await client.get("/api/v1/invoices", params={"order_id": "1001", "include_count": "true"})).json()
+
+        self.assertEqual([row["order_id"] for row in first["results"]], ["1002", "1001"])
+        self.assertIsNone(first["count"])
+        self.assertEqual([row["order_id"] for row in rest["results"]], ["1000"])
+        self.assertIsNone(rest["next_before"])
+        self.assertEqual(first["results"][0]["invoice_id"], digest(payload("1002"))[:12])
+        self.assertEqual([row["order_id"] for row in counted["results"]], ["1001"])
+        self.assertEqual(counted["count"], 3)